@@ -1,15 +1,24 @@
 import os
 import csv
+import re
+import mimetypes
+import threading
 from datetime import datetime, timezone, timedelta
 from functools import wraps
 from io import BytesIO, StringIO
 
-import psycopg2
+import click
 from flask import Flask, jsonify, redirect, render_template, request, send_file, session, url_for
 from werkzeug.security import check_password_hash, generate_password_hash
 
 from openpyxl import Workbook
 
+from assets import ASSET_URL_PREFIX, build_assets, pick_encoding
+from importer import IMPORT_CHUNK_SIZE, IMPORT_FORMATS, import_clicks
+from maintenance import MAINTENANCE_BATCH_SIZE, MIN_RETENTION_DAYS, format_storage_report, run_maintenance
+from queries import timings as query_timings
+from storage import DEFAULT_STATION, EXPORT_COLUMNS, get_storage
+
 try:
     from replit.object_storage import Client as ObjectStorageClient
 except Exception:  # pragma: no cover - optional dependency in non-Replit envs
@@ -23,209 +32,37 @@ app.secret_key = os.getenv("FLASK_SECRET_KEY") or os.urandom(32)
 ALLOWED_BUTTON_IDS = {1, 2, 3, 4}
 OBJECT_STORAGE_BUCKET = "BtnIcons"
 MAX_ICON_BYTES = 2 * 1024 * 1024
+MAX_CLICK_BATCH = 200
+MAX_CLIENT_CLOCK_SKEW = timedelta(minutes=5)
+STATION_RE = re.compile(r"^[a-z0-9][a-z0-9-]{0,39}$")
 
-ISO_DATE_REGEX = "^[0-9]{4}-[0-9]{2}-[0-9]{2}"
-ISO_TIME_REGEX = "^[0-9]{2}:[0-9]{2}"
-
-DATE_MATCH_SQL = f"""
-(
-    (date_iso IS NOT NULL AND date_iso = %s)
-    OR (
-        date IS NOT NULL
-        AND (date::text) ~ '{ISO_DATE_REGEX}'
-        AND (date::date) = %s
-    )
-    OR (
-        timestamp IS NOT NULL
-        AND (timestamp::text) ~ '{ISO_DATE_REGEX}'
-        AND left(timestamp::text, 10) = %s
-    )
-)
-"""
-
-NORMALIZED_DATE_SQL = f"""
-    COALESCE(
-        NULLIF(date_iso, ''),
-        CASE
-            WHEN date IS NOT NULL AND (date::text) ~ '{ISO_DATE_REGEX}'
-                THEN to_char(date::date, 'YYYY-MM-DD')
-            ELSE NULL
-        END,
-        CASE
-            WHEN timestamp IS NOT NULL AND (timestamp::text) ~ '{ISO_DATE_REGEX}'
-                THEN left(timestamp::text, 10)
-            ELSE NULL
-        END
-    )
-"""
-
-NORMALIZED_HOUR_SQL = f"""
-    COALESCE(
-        CASE
-            WHEN time IS NOT NULL AND (time::text) ~ '{ISO_TIME_REGEX}'
-                THEN NULLIF(split_part(time::text, ':', 1), '')::int
-            ELSE NULL
-        END,
-        CASE
-            WHEN timestamp IS NOT NULL AND (timestamp::text) ~ '{ISO_DATE_REGEX}'
-                THEN NULLIF(substring(timestamp::text FROM '^[0-9]{4}-[0-9]{2}-[0-9]{2}.([0-9]{2})'), '')::int
-            ELSE NULL
-        END
-    )
-"""
-
-
-def get_db_conn():
-    database_url = os.getenv("DATABASE_URL")
-    if not database_url:
-        raise RuntimeError("Missing DATABASE_URL environment variable")
-
-    # Replit/Postgres providers often require TLS.
-    # If the URL already sets sslmode, keep it; otherwise default to require.
-    if "sslmode=" in database_url:
-        return psycopg2.connect(database_url)
-
-    return psycopg2.connect(database_url, sslmode=os.getenv("PGSSLMODE", "require"))
+# Fingerprinted copies of static/*.js|css, built by the first request that
+# needs them (see assets.py), so CLI commands never write to static/dist.
+ASSETS_DIR = os.path.join(app.static_folder, "dist")
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+_asset_manifest = None
+_asset_manifest_lock = threading.Lock()
 
 
 def init_db():
-    create_click_sql = """
-    CREATE TABLE IF NOT EXISTS click (
-      id SERIAL PRIMARY KEY,
-      button_id INTEGER,
-      button TEXT,
-      seq INTEGER,
-      date TEXT,
-      date_iso TEXT,
-      time TIME,
-      timestamp TIMESTAMPTZ
-    );
-    """
-
-    create_passwords_sql = """
-    CREATE TABLE IF NOT EXISTS passwords (
-      id SERIAL PRIMARY KEY,
-      pin_hash TEXT NOT NULL,
-      created_at TIMESTAMPTZ NOT NULL DEFAULT now()
-    );
-    """
-
-    create_button_config_sql = """
-    CREATE TABLE IF NOT EXISTS button_config (
-      button_id INTEGER PRIMARY KEY,
-      label TEXT NOT NULL,
-      icon_key TEXT,
-      icon_mime TEXT,
-      icon_updated_at TIMESTAMPTZ
-    );
-    """
-
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(create_click_sql)
-            cur.execute(create_passwords_sql)
-            cur.execute(create_button_config_sql)
-            _migrate_click_schema(cur)
-            _migrate_button_config(cur)
-        conn.commit()
-
+    get_storage().init_schema()
     _ensure_pin_seeded()
     _ensure_button_config_seeded()
 
 
-def _migrate_click_schema(cur):
-    """Best-effort migration to support older schemas.
-
-    If a previous version created table `click` without some columns (ex: missing
-    button_id), we add them. We intentionally avoid NOT NULL constraints here to
-    keep older rows valid.
-    """
-
-    cur.execute("ALTER TABLE click ADD COLUMN IF NOT EXISTS button_id INTEGER;")
-    cur.execute("ALTER TABLE click ADD COLUMN IF NOT EXISTS button TEXT;")
-    cur.execute("ALTER TABLE click ADD COLUMN IF NOT EXISTS seq INTEGER;")
-    cur.execute("ALTER TABLE click ALTER COLUMN date TYPE TEXT;")
-    cur.execute("ALTER TABLE click ADD COLUMN IF NOT EXISTS date_iso TEXT;")
-    cur.execute("ALTER TABLE click ADD COLUMN IF NOT EXISTS time TIME;")
-    cur.execute("ALTER TABLE click ADD COLUMN IF NOT EXISTS timestamp TIMESTAMPTZ;")
-
-    # Backfill button_id from button text when possible (e.g. "Botão 1").
-    cur.execute(
-        """
-        UPDATE click
-        SET button_id = (regexp_match(button, '(\\d+)'))[1]::int
-        WHERE button_id IS NULL
-          AND button IS NOT NULL
-          AND regexp_match(button, '(\\d+)') IS NOT NULL;
-        """
-    )
-
-
-def _migrate_button_config(cur):
-    cur.execute("ALTER TABLE button_config ADD COLUMN IF NOT EXISTS icon_key TEXT;")
-    cur.execute("ALTER TABLE button_config ADD COLUMN IF NOT EXISTS icon_mime TEXT;")
-    cur.execute("ALTER TABLE button_config ADD COLUMN IF NOT EXISTS icon_updated_at TIMESTAMPTZ;")
-
-
 def _ensure_pin_seeded():
     """Seed initial PIN from env ADMIN_PIN if passwords table is empty."""
     admin_pin = os.getenv("ADMIN_PIN")
     if not admin_pin:
         return
 
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT COUNT(*) FROM passwords;")
-            count = int(cur.fetchone()[0])
-            if count == 0:
-                cur.execute(
-                    "INSERT INTO passwords (pin_hash) VALUES (%s);",
-                    (generate_password_hash(admin_pin),),
-                )
-        conn.commit()
+    db = get_storage()
+    if db.pin_count(DEFAULT_STATION) == 0:
+        db.add_pin(DEFAULT_STATION, generate_password_hash(admin_pin))
 
 
 def _ensure_button_config_seeded():
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            for bid in sorted(ALLOWED_BUTTON_IDS):
-                cur.execute("SELECT 1 FROM button_config WHERE button_id = %s;", (bid,))
-                if cur.fetchone() is None:
-                    cur.execute(
-                        "INSERT INTO button_config (button_id, label) VALUES (%s, %s);",
-                        (bid, f"Botão {bid}"),
-                    )
-        conn.commit()
-
-
-def _get_button_config_map():
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT button_id, label, icon_key, icon_mime, icon_updated_at
-                FROM button_config
-                ORDER BY button_id;
-                """
-            )
-            rows = cur.fetchall()
-    config = {}
-    for (bid, label, icon_key, icon_mime, icon_updated_at) in rows:
-        config[int(bid)] = {
-            "label": label,
-            "icon_key": icon_key,
-            "icon_mime": icon_mime,
-            "icon_updated_at": icon_updated_at,
-        }
-    return config
-
-
-def _get_button_label(button_id):
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT label FROM button_config WHERE button_id = %s;", (button_id,))
-            row = cur.fetchone()
-            return row[0] if row else f"Botão {button_id}"
+    get_storage().seed_button_config(DEFAULT_STATION, ALLOWED_BUTTON_IDS)
 
 
 def _get_object_storage_client():
@@ -234,9 +71,12 @@ def _get_object_storage_client():
     return ObjectStorageClient()
 
 
-def _build_icon_key(button_id, ext):
+def _build_icon_key(station, button_id, ext):
     safe_ext = ext.lstrip(".")
-    return f"{OBJECT_STORAGE_BUCKET}/button-{button_id}.{safe_ext}"
+    if station == DEFAULT_STATION:
+        # Same key as before stations existed, so existing icons keep working.
+        return f"{OBJECT_STORAGE_BUCKET}/button-{button_id}.{safe_ext}"
+    return f"{OBJECT_STORAGE_BUCKET}/{station}/button-{button_id}.{safe_ext}"
 
 
 def _delete_object_storage_key(client, key):
@@ -248,12 +88,43 @@ def _delete_object_storage_key(client, key):
     raise RuntimeError("Object Storage client não suporta delete().")
 
 
-def _get_current_pin_hash():
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT pin_hash FROM passwords ORDER BY id DESC LIMIT 1;")
-            row = cur.fetchone()
-            return row[0] if row else None
+def _get_asset_manifest():
+    global _asset_manifest
+    if _asset_manifest is None:
+        with _asset_manifest_lock:
+            if _asset_manifest is None:
+                try:
+                    _asset_manifest = build_assets(app.static_folder, ASSETS_DIR)
+                except OSError as e:
+                    # Read-only filesystem: templates fall back to the plain /static URLs.
+                    app.logger.warning("Asset build skipped/failed: %s", e)
+                    _asset_manifest = {}
+    return _asset_manifest
+
+
+def asset_url(name):
+    """URL of a static JS/CSS file, fingerprinted when the asset build ran."""
+    hashed_name = _get_asset_manifest().get(name)
+    if hashed_name is None:
+        return url_for("static", filename=name)
+    return f"{ASSET_URL_PREFIX}{hashed_name}"
+
+
+app.jinja_env.globals["asset_url"] = asset_url
+
+
+def _parse_station(value):
+    """Return (station, error) for a station name sent by the client."""
+    if value is None or value == "":
+        return DEFAULT_STATION, None
+    if not isinstance(value, str) or not STATION_RE.match(value.strip().lower()):
+        return None, "Estação inválida."
+    return value.strip().lower(), None
+
+
+def _current_station():
+    """Station chosen at login; every query of the session is scoped to it."""
+    return session.get("station") or DEFAULT_STATION
 
 
 def require_auth(view_fn):
@@ -301,7 +172,12 @@ def api_auth_pin():
     if not isinstance(pin, str) or not pin.strip():
         return jsonify({"error": "PIN inválido."}), 400
 
-    pin_hash = _get_current_pin_hash()
+    station, error = _parse_station(payload.get("station"))
+    if error:
+        return jsonify({"error": error}), 400
+
+    db = get_storage()
+    pin_hash = db.current_pin_hash(station)
     if not pin_hash:
         return (
             jsonify(
@@ -315,8 +191,10 @@ def api_auth_pin():
     if not check_password_hash(pin_hash, pin):
         return jsonify({"error": "PIN incorreto."}), 401
 
+    db.seed_button_config(station, ALLOWED_BUTTON_IDS)
     session["authed"] = True
-    return jsonify({"ok": True})
+    session["station"] = station
+    return jsonify({"ok": True, "station": station})
 
 
 @app.post("/api/auth/logout")
@@ -325,11 +203,87 @@ def api_logout():
     return jsonify({"ok": True})
 
 
+@app.get(f"{ASSET_URL_PREFIX}<filename>")
+def fingerprinted_asset(filename):
+    """Serve a fingerprinted asset, pre-compressed when the client accepts it.
+
+    The name changes with the content, so the response can be cached forever.
+    """
+    if filename not in _get_asset_manifest().values():
+        return ("", 404)
+
+    path, encoding = pick_encoding(os.path.join(ASSETS_DIR, filename), request.accept_encodings)
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    # download_name keeps the .br/.gz suffix out of Content-Disposition.
+    response = send_file(
+        path, mimetype=mimetype, conditional=True, max_age=ASSET_MAX_AGE, download_name=filename
+    )
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.headers["Vary"] = "Accept-Encoding"
+    response.headers["Cache-Control"] = f"public, max-age={ASSET_MAX_AGE}, immutable"
+    return response
+
+
 @app.get("/health")
 def health():
     return jsonify({"ok": True})
 
 
+def _parse_button_id(value):
+    """Return (button_id, error) for a JSON button_id value."""
+    try:
+        button_id = int(value)
+    except Exception:
+        return None, "button_id tem de ser um inteiro."
+
+    if button_id not in ALLOWED_BUTTON_IDS:
+        return None, "button_id inválido."
+    return button_id, None
+
+
+def _parse_tapped_at(value, now):
+    """Convert a client tap time (ms since epoch) into a local datetime.
+
+    Taps queued offline keep the moment they happened. Missing values and
+    clocks running ahead of the server fall back to the server time.
+    """
+    if value is None:
+        return now
+    try:
+        tapped_at = datetime.fromtimestamp(float(value) / 1000, tz=timezone.utc).astimezone()
+    except (TypeError, ValueError, OverflowError, OSError):
+        return now
+    if tapped_at > now + MAX_CLIENT_CLOCK_SKEW:
+        return now
+    return tapped_at
+
+
+def _build_click(button_id, button_label, when, client_key=None):
+    day = when.date()
+    return {
+        "button_id": button_id,
+        "button": button_label,
+        "day": day,
+        "date": day.strftime("%d/%m/%Y"),
+        "time": when.strftime("%H:%M:%S"),
+        "timestamp": when.isoformat(timespec="seconds"),
+        "client_key": client_key,
+    }
+
+
+def _click_response(click, seq):
+    return {
+        "button_id": click["button_id"],
+        "seq": seq,
+        "date": click["date"],
+        "time": click["time"][:5],
+        "button": click["button"],
+        "date_iso": click["day"].isoformat(),
+        "timestamp": click["timestamp"],
+    }
+
+
 @app.post("/api/click")
 @require_auth
 def api_click():
@@ -343,71 +297,86 @@ def api_click():
     if not isinstance(payload, dict):
         return jsonify({"error": "JSON inválido."}), 400
 
-    button_id = payload.get("button_id")
-    try:
-        button_id = int(button_id)
-    except Exception:
-        return jsonify({"error": "button_id tem de ser um inteiro."}), 400
-
-    if button_id not in ALLOWED_BUTTON_IDS:
-        return jsonify({"error": "button_id inválido."}), 400
+    button_id, error = _parse_button_id(payload.get("button_id"))
+    if error:
+        return jsonify({"error": error}), 400
 
     now = datetime.now(timezone.utc).astimezone()
-    today = now.date()
-    date_iso = today.isoformat()
-    click_time_str = now.strftime("%H:%M:%S")
-    timestamp_str = now.isoformat(timespec="seconds")
-    button_label = _get_button_label(button_id)
-
-    with get_db_conn() as conn:
-        # Ensure seq is consistent under concurrent clicks.
-        # Exclusive lock serializes increments for the day.
-        with conn.cursor() as cur:
-            cur.execute("LOCK TABLE click IN EXCLUSIVE MODE;")
-            cur.execute(
-                f"SELECT COUNT(*) FROM click WHERE button_id = %s AND {DATE_MATCH_SQL};",
-                (button_id, date_iso, today, date_iso),
-            )
-            count_today = int(cur.fetchone()[0])
-            seq = count_today + 1
-
-            date_display = today.strftime("%d/%m/%Y")
-
-            cur.execute(
-                """
-                INSERT INTO click (button_id, button, seq, date, date_iso, time, timestamp)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    button_id,
-                    button_label,
-                    seq,
-                    date_display,
-                    date_iso,
-                    click_time_str,
-                    timestamp_str,
-                ),
-            )
+    station = _current_station()
+    db = get_storage()
+    click = _build_click(button_id, db.button_label(station, button_id), now)
+    seq = db.record_click(station, click)
 
-        conn.commit()
+    return jsonify(_click_response(click, seq))
 
-    return jsonify(
-        {
-            "button_id": button_id,
-            "seq": seq,
-            "date": date_display,
-            "time": click_time_str[:5],
-            "button": button_label,
-            "date_iso": date_iso,
-            "timestamp": timestamp_str,
-        }
-    )
+
+@app.post("/api/clicks/batch")
+@require_auth
+def api_clicks_batch():
+    """Regista cliques acumulados offline pela página dos botões.
+
+    Input JSON:
+      {"clicks": [{"id": "<uuid>", "button_id": 1, "tapped_at": 1760000000000}, ...]}
+
+    `id` é a chave de idempotência: reenviar o mesmo clique devolve o `seq`
+    original em vez de o registar duas vezes. Cliques inválidos são devolvidos
+    em `rejected` e não devem ser reenviados.
+    """
+
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict) or not isinstance(payload.get("clicks"), list):
+        return jsonify({"error": "JSON inválido."}), 400
+
+    items = payload["clicks"]
+    if len(items) > MAX_CLICK_BATCH:
+        return jsonify({"error": f"Demasiados cliques (máx {MAX_CLICK_BATCH})."}), 400
+
+    now = datetime.now(timezone.utc).astimezone()
+    station = _current_station()
+    db = get_storage()
+    config = db.button_config_map(station)
+
+    clicks = []
+    rejected = []
+    for item in items:
+        if not isinstance(item, dict):
+            rejected.append({"id": None, "error": "Clique inválido."})
+            continue
+        client_key = item.get("id")
+        if not isinstance(client_key, str) or not client_key.strip() or len(client_key) > 64:
+            rejected.append({"id": client_key, "error": "id inválido."})
+            continue
+
+        button_id, error = _parse_button_id(item.get("button_id"))
+        if error:
+            rejected.append({"id": client_key, "error": error})
+            continue
+
+        label = config.get(button_id, {}).get("label") or f"Botão {button_id}"
+        when = _parse_tapped_at(item.get("tapped_at"), now)
+        clicks.append(_build_click(button_id, label, when, client_key=client_key))
+
+    # Insert in tap order so the daily `seq` follows the order of the taps.
+    clicks.sort(key=lambda c: c["timestamp"])
+    seqs = db.record_clicks(station, clicks) if clicks else []
+
+    results = []
+    for click, seq in zip(clicks, seqs):
+        result = _click_response(click, seq)
+        result["id"] = click["client_key"]
+        results.append(result)
+
+    return jsonify({"results": results, "rejected": rejected})
 
 
 @app.get("/api/buttons/config")
 @require_auth
 def api_buttons_config():
-    config = _get_button_config_map()
+    station = _current_station()
+    db = get_storage()
+    config = db.button_config_map(station)
+    today = datetime.now(timezone.utc).astimezone().date()
+    last_seqs = db.last_seqs_for_day(station, today)
     result = []
     for bid in sorted(ALLOWED_BUTTON_IDS):
         entry = config.get(bid, {"label": f"Botão {bid}", "icon_key": None})
@@ -419,9 +388,10 @@ def api_buttons_config():
                 "has_icon": bool(entry.get("icon_key")),
                 "icon_url": f"/api/buttons/icon/{bid}" if entry.get("icon_key") else None,
                 "icon_updated_at": icon_updated_at.isoformat() if icon_updated_at else None,
+                "seq_today": last_seqs.get(bid, 0),
             }
         )
-    return jsonify({"buttons": result})
+    return jsonify({"buttons": result, "date_iso": today.isoformat(), "station": station})
 
 
 @app.post("/api/buttons/config")
@@ -447,13 +417,7 @@ def api_buttons_config_update():
 
     label = label.strip()[:80]
 
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "UPDATE button_config SET label = %s WHERE button_id = %s;",
-                (label, button_id),
-            )
-        conn.commit()
+    get_storage().update_button_label(_current_station(), button_id, label)
 
     return jsonify({"ok": True, "button_id": button_id, "label": label})
 
@@ -486,24 +450,15 @@ def api_buttons_icon_upload(button_id):
     if len(data) > MAX_ICON_BYTES:
         return jsonify({"error": "Ficheiro demasiado grande (máx 2MB)."}), 400
 
+    station = _current_station()
     try:
         client = _get_object_storage_client()
-        key = _build_icon_key(button_id, ext)
+        key = _build_icon_key(station, button_id, ext)
         client.upload_from_bytes(key, data)
     except Exception as e:
         return jsonify({"error": f"Falha ao guardar no Object Storage: {e}"}), 500
 
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                UPDATE button_config
-                SET icon_key = %s, icon_mime = %s, icon_updated_at = now()
-                WHERE button_id = %s;
-                """,
-                (key, mime, button_id),
-            )
-        conn.commit()
+    get_storage().set_button_icon(station, button_id, key, mime)
 
     return jsonify({"ok": True, "button_id": button_id})
 
@@ -514,16 +469,10 @@ def api_buttons_icon_get(button_id):
     if button_id not in ALLOWED_BUTTON_IDS:
         return jsonify({"error": "button_id inválido."}), 400
 
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT icon_key, icon_mime FROM button_config WHERE button_id = %s;",
-                (button_id,),
-            )
-            row = cur.fetchone()
-            if not row or not row[0]:
-                return ("", 404)
-            icon_key, icon_mime = row
+    icon = get_storage().button_icon(_current_station(), button_id)
+    if icon is None:
+        return ("", 404)
+    icon_key, icon_mime = icon
 
     try:
         client = _get_object_storage_client()
@@ -540,14 +489,10 @@ def api_buttons_icon_delete(button_id):
     if button_id not in ALLOWED_BUTTON_IDS:
         return jsonify({"error": "button_id inválido."}), 400
 
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                "SELECT icon_key FROM button_config WHERE button_id = %s;",
-                (button_id,),
-            )
-            row = cur.fetchone()
-            icon_key = row[0] if row else None
+    station = _current_station()
+    db = get_storage()
+    icon = db.button_icon(station, button_id)
+    icon_key = icon[0] if icon else None
 
     warning = None
     if icon_key:
@@ -558,17 +503,7 @@ def api_buttons_icon_delete(button_id):
             # Ainda assim limpamos a configuração para o UI deixar de mostrar o ícone.
             warning = str(e)
 
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                UPDATE button_config
-                SET icon_key = NULL, icon_mime = NULL, icon_updated_at = NULL
-                WHERE button_id = %s;
-                """,
-                (button_id,),
-            )
-        conn.commit()
+    db.clear_button_icon(station, button_id)
 
     payload = {"ok": True, "button_id": button_id}
     if warning:
@@ -582,67 +517,16 @@ def api_admin_stats():
     today = datetime.now(timezone.utc).astimezone().date()
     lookback_start = today - timedelta(days=13)
 
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute("SELECT COUNT(*) FROM click;")
-            total = int(cur.fetchone()[0])
-
-            cur.execute(
-                f"SELECT COUNT(*) FROM click WHERE {DATE_MATCH_SQL};",
-                (today.isoformat(), today, today.isoformat()),
-            )
-            total_today = int(cur.fetchone()[0])
-
-            cur.execute(
-                "SELECT button_id, COUNT(*) FROM click GROUP BY button_id ORDER BY button_id;"
-            )
-            per_button_rows = cur.fetchall()
-            per_button = {int(b): int(c) for (b, c) in per_button_rows}
-
-            cur.execute(
-                f"""
-                WITH normalized AS (
-                    SELECT {NORMALIZED_DATE_SQL} AS day_iso
-                    FROM click
-                )
-                SELECT day_iso::date AS day, COUNT(*)
-                FROM normalized
-                WHERE day_iso IS NOT NULL
-                  AND day_iso::date >= %s
-                GROUP BY day
-                ORDER BY day;
-                """,
-                (lookback_start,),
-            )
-            per_day_rows = cur.fetchall()
-            per_day = [{"date": d.isoformat(), "count": int(c)} for (d, c) in per_day_rows]
-
-            cur.execute(
-                f"""
-                WITH normalized AS (
-                    SELECT
-                        {NORMALIZED_DATE_SQL} AS day_iso,
-                        {NORMALIZED_HOUR_SQL} AS hour_val
-                    FROM click
-                )
-                SELECT hour_val, COUNT(*)
-                FROM normalized
-                WHERE day_iso IS NOT NULL
-                  AND day_iso::date = %s
-                  AND hour_val IS NOT NULL
-                GROUP BY hour_val
-                ORDER BY hour_val;
-                """,
-                (today,),
-            )
-            per_hour_rows = cur.fetchall()
-            per_hour = [{"hour": int(h), "count": int(c)} for (h, c) in per_hour_rows]
+    station = _current_station()
+    db = get_storage()
+    stats = db.stats(station, today, lookback_start)
+    per_button = stats["per_button"]
 
     # Ensure keys exist for 1..4
     for bid in sorted(ALLOWED_BUTTON_IDS):
         per_button.setdefault(bid, 0)
 
-    button_config = _get_button_config_map()
+    button_config = db.button_config_map(station)
     button_labels = {
         bid: (button_config.get(bid, {}).get("label") or f"Botão {bid}")
         for bid in sorted(ALLOWED_BUTTON_IDS)
@@ -650,16 +534,136 @@ def api_admin_stats():
 
     return jsonify(
         {
-            "total": total,
-            "today": total_today,
+            "total": stats["total"],
+            "today": stats["today"],
             "perButton": per_button,
-            "perDay": per_day,
-            "perHourToday": per_hour,
+            "perDay": stats["per_day"],
+            "perHourToday": stats["per_hour"],
             "buttonLabels": button_labels,
         }
     )
 
 
+@app.post("/api/admin/import")
+@require_auth
+def api_admin_import():
+    """Importa cliques históricos de um ficheiro CSV/XLSX no formato do export.
+
+    Multipart: campo `file`. Devolve {read, imported, rejected, errors, seconds, rows_per_second}.
+    """
+    upload = request.files.get("file")
+    if not upload or not upload.filename:
+        return jsonify({"error": "Ficheiro 'file' em falta."}), 400
+
+    fmt = os.path.splitext(upload.filename)[1].lower().lstrip(".")
+    if fmt not in IMPORT_FORMATS:
+        return jsonify({"error": "Formato inválido. Usa csv ou xlsx."}), 400
+
+    try:
+        report = import_clicks(get_storage(), _current_station(), upload.stream, fmt, ALLOWED_BUTTON_IDS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify(report)
+
+
+@app.cli.command("import-clicks")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--station", default=DEFAULT_STATION, show_default=True, help="Estação de destino.")
+@click.option("--chunk-size", default=IMPORT_CHUNK_SIZE, show_default=True, help="Linhas por lote de COPY.")
+def import_clicks_command(path, station, chunk_size):
+    """Importa cliques históricos de um ficheiro CSV/XLSX no formato do export."""
+    fmt = os.path.splitext(path)[1].lower().lstrip(".")
+    if fmt not in IMPORT_FORMATS:
+        raise click.UsageError("Formato inválido. Usa csv ou xlsx.")
+    station, error = _parse_station(station)
+    if error:
+        raise click.UsageError(error)
+
+    db = get_storage()
+    db.seed_button_config(station, ALLOWED_BUTTON_IDS)
+    with open(path, "rb") as fh:
+        report = import_clicks(db, station, fh, fmt, ALLOWED_BUTTON_IDS, chunk_size=chunk_size)
+
+    for error in report["errors"]:
+        click.echo(f"linha {error['line']}: {error['error']}", err=True)
+    click.echo(
+        f"{report['imported']} importados, {report['rejected']} rejeitados "
+        f"de {report['read']} lidos em {report['seconds']}s ({report['rows_per_second']} linhas/s)"
+    )
+
+
+@app.cli.command("set-station-pin")
+@click.argument("station")
+@click.option("--pin", prompt=True, hide_input=True, confirmation_prompt=True, help="PIN da estação.")
+def set_station_pin_command(station, pin):
+    """Cria uma estação (ou troca o seu PIN) e os respetivos botões."""
+    station, error = _parse_station(station)
+    if error:
+        raise click.UsageError(error)
+    if not pin.strip():
+        raise click.UsageError("PIN inválido.")
+
+    db = get_storage()
+    db.add_pin(station, generate_password_hash(pin))
+    db.seed_button_config(station, ALLOWED_BUTTON_IDS)
+    click.echo(f"PIN da estação '{station}' atualizado.")
+
+
+@app.cli.command("maintenance")
+@click.option(
+    "--retention-days",
+    type=int,
+    envvar="CLICK_RETENTION_DAYS",
+    help=f"Apaga cliques com mais de N dias (mín. {MIN_RETENTION_DAYS}); os totais em click_daily ficam.",
+)
+@click.option("--archive", "archive_path", type=click.Path(dir_okay=False), help="Guarda os cliques apagados neste CSV.")
+@click.option("--batch-size", default=MAINTENANCE_BATCH_SIZE, show_default=True, help="Linhas por transação.")
+@click.option("--drop-columns", is_flag=True, help="Remove as colunas antigas button, date e time da tabela click.")
+@click.option("--vacuum-full", is_flag=True, help="PostgreSQL: VACUUM FULL (bloqueia as tabelas enquanto corre).")
+def maintenance_command(retention_days, archive_path, batch_size, drop_columns, vacuum_full):
+    """Compacta cliques antigos, aplica a retenção e faz VACUUM, com relatório de espaço."""
+    try:
+        report = run_maintenance(
+            get_storage(),
+            retention_days=retention_days,
+            archive_path=archive_path,
+            batch_size=batch_size,
+            drop_columns=drop_columns,
+            vacuum_full=vacuum_full,
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e))
+
+    click.echo("Antes:")
+    for line in format_storage_report(report["before"]):
+        click.echo(f"  {line}")
+    click.echo(f"{report['compacted']} linhas compactadas")
+    if "before_day" in report:
+        click.echo(f"{report['deleted']} cliques anteriores a {report['before_day']} apagados")
+    if report["dropped_columns"]:
+        click.echo(f"colunas removidas: {', '.join(report['dropped_columns'])}")
+    if "drop_error" in report:
+        click.echo(report["drop_error"], err=True)
+    click.echo("Depois:")
+    for line in format_storage_report(report["after"]):
+        click.echo(f"  {line}")
+    click.echo(f"concluído em {report['seconds']}s")
+
+
+@app.get("/api/admin/queries")
+@require_auth
+def api_admin_queries():
+    """Tempos por query declarada em queries.py desde o arranque (ou último reset).
+
+    `?reset=1` devolve os valores e volta a zero.
+    """
+    snapshot = query_timings.snapshot()
+    if request.args.get("reset") == "1":
+        query_timings.reset()
+    return jsonify({"queries": snapshot})
+
+
 @app.get("/admin/export.xlsx")
 @require_auth
 def admin_export_xlsx():
@@ -679,26 +683,10 @@ def _build_click_export_response(fmt: str):
     if fmt not in allowed:
         return jsonify({"error": "Formato inválido. Usa xlsx, csv ou txt."}), 400
 
-    with get_db_conn() as conn:
-        with conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT
-                  id,
-                  COALESCE(button_id, NULL) AS button_id,
-                  COALESCE(button, '') AS button,
-                  COALESCE(seq, NULL) AS seq,
-                  date::text AS date,
-                  COALESCE(date_iso, '') AS date_iso,
-                  time::text AS time,
-                  timestamp::text AS timestamp
-                FROM click
-                ORDER BY id DESC;
-                """
-            )
-            rows = cur.fetchall()
-
-    headers = ["id", "button_id", "button", "seq", "date", "date_iso", "time", "timestamp"]
+    station = _current_station()
+    rows = get_storage().export_rows(station)
+    headers = list(EXPORT_COLUMNS)
+    prefix = "clicks" if station == DEFAULT_STATION else f"clicks_{station}"
 
     if fmt == "csv":
         sio = StringIO(newline="")
@@ -719,7 +707,7 @@ def _build_click_export_response(fmt: str):
             )
 
         data = sio.getvalue().encode("utf-8-sig")
-        filename = f"clicks_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
+        filename = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M')}.csv"
         return send_file(
             BytesIO(data),
             as_attachment=True,
@@ -746,7 +734,7 @@ def _build_click_export_response(fmt: str):
             )
 
         data = ("\n".join(lines) + "\n").encode("utf-8")
-        filename = f"clicks_{datetime.now().strftime('%Y%m%d_%H%M')}.txt"
+        filename = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M')}.txt"
         return send_file(
             BytesIO(data),
             as_attachment=True,
@@ -777,7 +765,7 @@ def _build_click_export_response(fmt: str):
     wb.save(buf)
     buf.seek(0)
 
-    filename = f"clicks_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
+    filename = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx"
     return send_file(
         buf,
         as_attachment=True,
@@ -0,0 +1,86 @@
+import gzip
+import hashlib
+import json
+import os
+
+try:
+    import brotli
+except Exception:  # pragma: no cover - optional dependency, gzip still works without it
+    brotli = None
+
+
+FINGERPRINT_EXTENSIONS = (".js", ".css")
+ASSET_URL_PREFIX = "/assets/"
+MANIFEST_NAME = "manifest.json"
+
+# Content-Encoding -> file suffix, in order of preference.
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _write_atomic(path, data):
+    # Several workers may build at the same time; never expose a partial file.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as fh:
+        fh.write(data)
+    os.replace(tmp_path, path)
+
+
+def build_assets(static_dir, out_dir):
+    """Fingerprint the JS/CSS files in `static_dir` into `out_dir`.
+
+    Each `name.ext` becomes `name.<hash>.ext` next to pre-compressed `.gz`
+    (and `.br` when brotli is installed) variants. Files whose hash did not
+    change are left untouched; files of older builds are removed. Returns the
+    manifest {"app.js": "app.<hash>.js"}, also written to `out_dir/manifest.json`.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+
+    for name in sorted(os.listdir(static_dir)):
+        if not name.endswith(FINGERPRINT_EXTENSIONS):
+            continue
+        src_path = os.path.join(static_dir, name)
+        if not os.path.isfile(src_path):
+            continue
+
+        with open(src_path, "rb") as fh:
+            data = fh.read()
+
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        stem, ext = os.path.splitext(name)
+        hashed_name = f"{stem}.{digest}{ext}"
+        manifest[name] = hashed_name
+
+        hashed_path = os.path.join(out_dir, hashed_name)
+        if not os.path.exists(hashed_path):
+            _write_atomic(hashed_path, data)
+        if not os.path.exists(hashed_path + ".gz"):
+            # mtime=0 keeps the .gz byte-identical across rebuilds.
+            _write_atomic(hashed_path + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+        if brotli is not None and not os.path.exists(hashed_path + ".br"):
+            _write_atomic(hashed_path + ".br", brotli.compress(data, quality=11))
+
+    # Drop variants of older builds so out_dir does not grow on every edit.
+    current = set(manifest.values())
+    for name in os.listdir(out_dir):
+        base = name
+        for _, suffix in ENCODINGS:
+            if name.endswith(suffix):
+                base = name[: -len(suffix)]
+        if name != MANIFEST_NAME and base not in current and not name.endswith(".tmp"):
+            os.remove(os.path.join(out_dir, name))
+
+    _write_atomic(os.path.join(out_dir, MANIFEST_NAME), json.dumps(manifest, indent=2).encode("utf-8"))
+    return manifest
+
+
+def pick_encoding(asset_path, accept_encodings):
+    """Return (path, content_encoding) for the best pre-compressed variant.
+
+    `accept_encodings` is the request's parsed Accept-Encoding header. Falls
+    back to the uncompressed file (content_encoding None).
+    """
+    for encoding, suffix in ENCODINGS:
+        if accept_encodings[encoding] > 0 and os.path.isfile(asset_path + suffix):
+            return asset_path + suffix, encoding
+    return asset_path, None
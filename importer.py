@@ -0,0 +1,198 @@
+import csv
+import io
+import time as time_module
+from datetime import date, datetime, time
+
+from openpyxl import load_workbook
+
+from storage import IMPORT_COLUMNS
+
+IMPORT_FORMATS = {"csv", "xlsx"}
+IMPORT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 20
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def iter_source_rows(stream, fmt):
+    """Yield (line_no, row dict) for each data row of a CSV/XLSX export.
+
+    The first row holds the column names; unknown columns (e.g. `id`) are ignored.
+    """
+    if fmt == "csv":
+        # utf-8-sig strips the BOM written by our own CSV export.
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+        sample = text.read(4096)
+        text.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        rows = csv.reader(text, dialect)
+    elif fmt == "xlsx":
+        wb = load_workbook(stream, read_only=True, data_only=True)
+        rows = wb.active.iter_rows(values_only=True)
+    else:
+        raise ValueError(f"Formato inválido: {fmt}")
+
+    headers = None
+    for line_no, values in enumerate(rows, start=1):
+        if headers is None:
+            headers = [str(h or "").strip().lower() for h in values]
+            if "button_id" not in headers:
+                raise ValueError("Cabeçalho sem a coluna button_id.")
+            continue
+        if not any(v not in (None, "") for v in values):
+            continue
+        yield line_no, dict(zip(headers, values))
+
+
+def _text(value):
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def _parse_timestamp(value):
+    if isinstance(value, datetime):
+        ts = value
+    else:
+        text = _text(value)
+        if not text:
+            return None
+        try:
+            ts = datetime.fromisoformat(text.replace(" ", "T", 1))
+        except ValueError:
+            raise ImportRowError(f"timestamp inválido: {text}")
+    if ts.tzinfo is None:
+        ts = ts.astimezone()
+    return ts
+
+
+def _parse_day(row):
+    for key in ("date_iso", "date"):
+        value = row.get(key)
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        text = _text(value)
+        if not text:
+            continue
+        for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+            try:
+                return datetime.strptime(text[:10], fmt).date()
+            except ValueError:
+                pass
+        raise ImportRowError(f"{key} inválido: {text}")
+    return None
+
+
+def _parse_time(value):
+    if isinstance(value, datetime):
+        return value.time().replace(microsecond=0)
+    if isinstance(value, time):
+        return value.replace(microsecond=0)
+    text = _text(value)
+    if not text:
+        return None
+    try:
+        return time.fromisoformat(text[:8])
+    except ValueError:
+        raise ImportRowError(f"time inválido: {text}")
+
+
+def normalize_row(row, allowed_button_ids):
+    """Validate one source row and return a tuple ordered like IMPORT_COLUMNS.
+
+    The day and timestamp are derived from whichever of timestamp,
+    date_iso/date and time is present, so the stored row has the same
+    compact shape as one written by /api/click. The `button` label column is
+    not stored; exports read the label from the button config.
+    """
+    try:
+        button_id = int(_text(row.get("button_id")))
+    except ValueError:
+        raise ImportRowError("button_id tem de ser um inteiro.")
+    if button_id not in allowed_button_ids:
+        raise ImportRowError(f"button_id inválido: {button_id}")
+
+    seq_text = _text(row.get("seq"))
+    try:
+        seq = int(seq_text) if seq_text else None
+    except ValueError:
+        raise ImportRowError(f"seq inválido: {seq_text}")
+
+    ts = _parse_timestamp(row.get("timestamp"))
+    day = _parse_day(row)
+    click_time = _parse_time(row.get("time"))
+
+    if ts is None:
+        if day is None:
+            raise ImportRowError("Sem data (timestamp, date_iso ou date).")
+        ts = datetime.combine(day, click_time or time(0, 0)).astimezone()
+    if day is None:
+        day = ts.date()
+
+    values = {
+        "button_id": button_id,
+        "seq": seq,
+        "date_iso": day.isoformat(),
+        "timestamp": ts.isoformat(timespec="seconds"),
+    }
+    return tuple(values[col] for col in IMPORT_COLUMNS)
+
+
+def import_clicks(db, station, stream, fmt, allowed_button_ids, chunk_size=IMPORT_CHUNK_SIZE):
+    """Stream a CSV/XLSX export into a station's clicks and return a report.
+
+    Invalid rows, and rows whose `seq` is already stored for the same day
+    and button, are skipped and reported (the first MAX_REPORTED_ERRORS of
+    them, with their line number); valid rows are bulk-loaded in chunks.
+    """
+    report = {"read": 0, "imported": 0, "rejected": 0, "errors": []}
+    started = time_module.monotonic()
+    # Line numbers of the chunk being loaded, for rows bulk_import() rejects.
+    chunk_lines = []
+
+    def reject(line_no, message):
+        report["rejected"] += 1
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"line": line_no, "error": message})
+
+    def reject_taken(index, row):
+        values = dict(zip(IMPORT_COLUMNS, row))
+        reject(
+            chunk_lines[index],
+            f"seq {values['seq']} já existe em {values['date_iso']} para o botão {values['button_id']}.",
+        )
+
+    def chunks():
+        chunk, lines = [], []
+        for line_no, row in iter_source_rows(stream, fmt):
+            report["read"] += 1
+            try:
+                chunk.append(normalize_row(row, allowed_button_ids))
+            except ImportRowError as e:
+                reject(line_no, str(e))
+                continue
+            lines.append(line_no)
+            if len(chunk) >= chunk_size:
+                chunk_lines[:] = lines
+                yield chunk
+                chunk, lines = [], []
+        if chunk:
+            chunk_lines[:] = lines
+            yield chunk
+
+    report["imported"] = db.bulk_import(station, chunks(), reject=reject_taken)
+    report["errors"].sort(key=lambda error: error["line"])
+
+    seconds = time_module.monotonic() - started
+    report["seconds"] = round(seconds, 3)
+    report["rows_per_second"] = int(report["read"] / seconds) if seconds > 0 else report["read"]
+    return report
@@ -0,0 +1,100 @@
+import csv
+import os
+import time as time_module
+from datetime import date, timedelta
+
+from storage import EXPORT_COLUMNS
+
+MAINTENANCE_BATCH_SIZE = 5000
+# Recent raw clicks must stay: today's hourly chart reads them, and a batch
+# retried by an offline kiosk is matched against their client_key.
+MIN_RETENTION_DAYS = 7
+
+
+def _open_archive(path):
+    """Open a CSV in the export format for appending, writing the header once."""
+    is_new = not os.path.exists(path) or os.path.getsize(path) == 0
+    # utf-8-sig only on a new file, otherwise the BOM lands mid-file.
+    fh = open(path, "a", encoding="utf-8-sig" if is_new else "utf-8", newline="")
+    writer = csv.writer(fh)
+    if is_new:
+        writer.writerow(EXPORT_COLUMNS)
+    return fh, writer
+
+
+def run_maintenance(
+    db,
+    retention_days=None,
+    archive_path=None,
+    batch_size=MAINTENANCE_BATCH_SIZE,
+    drop_columns=False,
+    vacuum_full=False,
+):
+    """Compact legacy clicks, apply retention, vacuum, and return a report.
+
+    Without `retention_days` no click is deleted. With `archive_path`, the
+    deleted clicks are first appended to that CSV (same format as the export).
+    The report holds the storage sizes before and after, plus the number of
+    rows compacted and deleted.
+    """
+    if retention_days is not None and retention_days < MIN_RETENTION_DAYS:
+        raise ValueError(f"A retenção mínima é de {MIN_RETENTION_DAYS} dias.")
+
+    started = time_module.monotonic()
+    report = {
+        "before": db.storage_report(),
+        "compacted": 0,
+        "deleted": 0,
+        "dropped_columns": [],
+    }
+
+    report["compacted"] = db.compact_clicks(batch_size)
+
+    if retention_days is not None:
+        before_day = date.today() - timedelta(days=retention_days)
+        report["before_day"] = before_day.isoformat()
+        if archive_path:
+            fh, writer = _open_archive(archive_path)
+            with fh:
+                report["deleted"] = db.purge_clicks(before_day, batch_size, archive=writer.writerows)
+        else:
+            report["deleted"] = db.purge_clicks(before_day, batch_size)
+
+    if drop_columns:
+        try:
+            report["dropped_columns"] = db.drop_legacy_columns()
+        except RuntimeError as e:
+            # Unconvertible legacy rows: keep the columns, still vacuum and report.
+            report["drop_error"] = str(e)
+
+    db.vacuum(full=vacuum_full)
+    report["after"] = db.storage_report()
+    report["seconds"] = round(time_module.monotonic() - started, 3)
+    return report
+
+
+def _size(value):
+    if value is None:
+        return "-"
+    for unit in ("B", "KB", "MB"):
+        if value < 1024:
+            return f"{value:.0f} {unit}" if unit == "B" else f"{value:.1f} {unit}"
+        value /= 1024
+    return f"{value:.1f} GB"
+
+
+def format_storage_report(storage):
+    """Render a storage_report() as text lines for the CLI."""
+    lines = [
+        f"{'tabela':<14}{'linhas':>10}{'mortas':>10}{'tabela':>12}{'índices':>12}{'livre':>12}",
+    ]
+    for entry in storage["tables"]:
+        dead_rows = "-" if entry["dead_rows"] is None else entry["dead_rows"]
+        lines.append(
+            f"{entry['table']:<14}{entry['rows']:>10}{dead_rows:>10}"
+            f"{_size(entry['table_bytes']):>12}{_size(entry['index_bytes']):>12}{_size(entry['free_bytes']):>12}"
+        )
+    lines.append(
+        f"base de dados: {_size(storage['database_bytes'])}, páginas livres: {_size(storage['free_bytes'])}"
+    )
+    return lines
@@ -0,0 +1,244 @@
+"""Hot-path SQL, declared once and run as prepared statements.
+
+Statements are written with `%s` placeholders. On PostgreSQL each one is
+PREPAREd the first time a pooled connection runs it and EXECUTEd from then
+on, so the server parses and plans it once per connection instead of on
+every call. On SQLite the same text (with `?` placeholders) lands in
+sqlite3's per-connection statement cache.
+
+Every run is timed under the statement name; see `timings.snapshot()`.
+"""
+
+import threading
+
+ISO_DATE_REGEX = "^[0-9]{4}-[0-9]{2}-[0-9]{2}"
+# dd/mm/YYYY, the `date` format written by the app itself.
+BR_DATE_REGEX = "^[0-9]{2}/[0-9]{2}/[0-9]{4}"
+
+# Day of a legacy row that may only have `date` or `timestamp` (PostgreSQL only).
+NORMALIZED_DATE_SQL = f"""
+    COALESCE(
+        NULLIF(date_iso, ''),
+        CASE
+            WHEN date IS NOT NULL AND (date::text) ~ '{ISO_DATE_REGEX}'
+                THEN to_char(date::date, 'YYYY-MM-DD')
+            WHEN date IS NOT NULL AND (date::text) ~ '{BR_DATE_REGEX}'
+                THEN to_char(to_date(left(date::text, 10), 'DD/MM/YYYY'), 'YYYY-MM-DD')
+            ELSE NULL
+        END,
+        CASE
+            WHEN timestamp IS NOT NULL AND (timestamp::text) ~ '{ISO_DATE_REGEX}'
+                THEN left(timestamp::text, 10)
+            ELSE NULL
+        END
+    )
+"""
+
+
+class Query:
+    """A named statement with an optional SQLite-specific variant."""
+
+    def __init__(self, name, sql, sqlite_sql=None):
+        self.name = name
+        self.sql = sql.strip().rstrip(";")
+        self.sqlite_sql = (sqlite_sql or sql).strip().rstrip(";").replace("%s", "?")
+        self.param_count = self.sql.count("%s")
+
+    def prepare_sql(self):
+        """PREPARE statement with `$1..$n` placeholders (types are inferred)."""
+        parts = self.sql.split("%s")
+        body = parts[0] + "".join(f"${i}{part}" for i, part in enumerate(parts[1:], start=1))
+        return f"PREPARE {self.name} AS {body};"
+
+    def execute_sql(self):
+        if not self.param_count:
+            return f"EXECUTE {self.name};"
+        return f"EXECUTE {self.name} ({', '.join(['%s'] * self.param_count)});"
+
+
+class QueryTimings:
+    """Thread-safe call count and latency per statement name."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, seconds):
+        with self._lock:
+            stat = self._stats.get(name)
+            if stat is None:
+                stat = self._stats[name] = [0, 0.0, 0.0]
+            stat[0] += 1
+            stat[1] += seconds
+            stat[2] = max(stat[2], seconds)
+
+    def snapshot(self):
+        with self._lock:
+            items = sorted(self._stats.items())
+        return {
+            name: {
+                "calls": calls,
+                "total_ms": round(total * 1000, 3),
+                "avg_ms": round(total * 1000 / calls, 3),
+                "max_ms": round(worst * 1000, 3),
+            }
+            for name, (calls, total, worst) in items
+        }
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+
+
+timings = QueryTimings()
+
+
+# --- Click path --------------------------------------------------------------
+
+# PostgreSQL only: transaction-scoped lock on one station's keyed batches and imports.
+STATION_LOCK = Query(
+    "station_lock",
+    "SELECT pg_advisory_xact_lock(hashtext(%s))",
+)
+
+CLICK_BY_CLIENT_KEY = Query(
+    "click_by_client_key",
+    "SELECT seq FROM click WHERE station = %s AND client_key = %s",
+)
+
+# Allocates the next daily `seq`: the (station, day, button) rollup row holds
+# both the counter (last_seq) and the stats aggregate (clicks), and only that
+# row gets locked.
+CLICK_NEXT_SEQ = Query(
+    "click_next_seq",
+    """
+    INSERT INTO click_daily (station, day, button_id, clicks, last_seq)
+    VALUES (%s, %s, %s, 1, 1)
+    ON CONFLICT (station, day, button_id)
+    DO UPDATE SET clicks = click_daily.clicks + 1, last_seq = click_daily.last_seq + 1
+    RETURNING last_seq
+    """,
+)
+
+CLICK_INSERT = Query(
+    "click_insert",
+    """
+    INSERT INTO click (station, button_id, seq, date_iso, timestamp, client_key)
+    VALUES (%s, %s, %s, %s, %s, %s)
+    """,
+)
+
+# Adds imported clicks to the totals; only the ones without a `seq` advance
+# the counter, numbered ones go through DAILY_RAISE.
+DAILY_BUMP = Query(
+    "click_daily_bump",
+    """
+    INSERT INTO click_daily (station, day, button_id, clicks, last_seq)
+    VALUES (%s, %s, %s, %s, %s)
+    ON CONFLICT (station, day, button_id)
+    DO UPDATE SET clicks = click_daily.clicks + excluded.clicks,
+                  last_seq = click_daily.last_seq + excluded.last_seq
+    """,
+)
+
+# Raises a day's counter to a seq that is already stored (imported history).
+# The totals in `clicks` are left alone.
+DAILY_RAISE = Query(
+    "click_daily_raise",
+    """
+    UPDATE click_daily
+    SET last_seq = %s
+    WHERE station = %s AND day = %s AND button_id = %s AND last_seq < %s
+    """,
+)
+
+# Seqs already stored for one (station, day, button) within a range.
+CLICK_SEQS = Query(
+    "click_seqs",
+    """
+    SELECT seq FROM click
+    WHERE station = %s AND date_iso = %s AND button_id = %s AND seq BETWEEN %s AND %s
+    """,
+)
+
+BUTTON_LABEL = Query(
+    "button_label",
+    "SELECT label FROM button_config WHERE station = %s AND button_id = %s",
+)
+
+BUTTON_CONFIG = Query(
+    "button_config",
+    """
+    SELECT button_id, label, icon_key, icon_mime, icon_updated_at
+    FROM button_config
+    WHERE station = %s
+    ORDER BY button_id
+    """,
+)
+
+DAILY_LAST_SEQS = Query(
+    "daily_last_seqs",
+    "SELECT button_id, last_seq FROM click_daily WHERE station = %s AND day = %s AND button_id > 0",
+)
+
+# --- Stats -------------------------------------------------------------------
+
+STATS_TOTAL = Query(
+    "stats_total",
+    "SELECT COALESCE(SUM(clicks), 0) FROM click_daily WHERE station = %s",
+)
+
+STATS_DAY_TOTAL = Query(
+    "stats_day_total",
+    "SELECT COALESCE(SUM(clicks), 0) FROM click_daily WHERE station = %s AND day = %s",
+)
+
+STATS_PER_BUTTON = Query(
+    "stats_per_button",
+    """
+    SELECT button_id, SUM(clicks)
+    FROM click_daily
+    WHERE station = %s
+      AND button_id > 0
+    GROUP BY button_id
+    ORDER BY button_id
+    """,
+)
+
+STATS_PER_DAY = Query(
+    "stats_per_day",
+    """
+    SELECT day, SUM(clicks)
+    FROM click_daily
+    WHERE station = %s
+      AND day >= %s
+    GROUP BY day
+    ORDER BY day
+    """,
+)
+
+# Rows for the current day are always written with date_iso and timestamp.
+# The first parameter is the app's UTC offset in seconds: local hours are
+# derived from the timestamp, whatever the database session time zone is.
+STATS_PER_HOUR = Query(
+    "stats_per_hour",
+    """
+    SELECT EXTRACT(HOUR FROM (timestamp AT TIME ZONE 'UTC') + make_interval(secs => %s))::int AS hour_val,
+           COUNT(*)
+    FROM click
+    WHERE station = %s
+      AND date_iso = %s
+      AND timestamp IS NOT NULL
+    GROUP BY hour_val
+    ORDER BY hour_val
+    """,
+    sqlite_sql="""
+    SELECT CAST(strftime('%H', timestamp, %s || ' seconds') AS INTEGER) AS hour_val, COUNT(*)
+    FROM click
+    WHERE station = %s
+      AND date_iso = %s
+      AND timestamp IS NOT NULL
+    GROUP BY hour_val
+    ORDER BY hour_val
+    """,
+)
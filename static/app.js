@@ -1,8 +1,25 @@
-function setButtonsDisabled(disabled) {
-	document.querySelectorAll("button[data-button-id]").forEach((btn) => {
-		btn.disabled = disabled;
-	});
-}
+// Taps are recorded locally first (IndexedDB) and flushed to the server in
+// batches. Each queued tap carries an idempotency key, so a batch that is
+// retried after a network failure is never counted twice.
+
+const QUEUE_DB_NAME = "clickcounter";
+const QUEUE_STORE = "clickQueue";
+const SEQ_STORAGE_KEY = "clickcounter.seq";
+const FLUSH_DELAY_MS = 300;
+const FLUSH_BATCH_SIZE = 50;
+const RETRY_MIN_MS = 1000;
+const RETRY_MAX_MS = 30000;
+
+let queueDbPromise = null;
+const memoryQueue = new Map();
+let flushTimer = null;
+let flushing = false;
+let retryDelay = RETRY_MIN_MS;
+// Counters are kept per station, so a shared device never mixes sequences.
+let seqStorageKey = SEQ_STORAGE_KEY;
+// Station of the current session (from /api/buttons/config). Queued taps
+// carry it and are only sent while that station is logged in.
+let currentStation = null;
 
 async function fetchJson(url) {
 	const res = await fetch(url, { headers: { Accept: "application/json" } });
@@ -31,24 +48,268 @@ function showToast(message) {
 	}, 1500);
 }
 
-async function handleClick(buttonId, buttonLabel) {
-	setButtonsDisabled(true);
-	try {
-		const res = await fetch("/api/click", {
-			method: "POST",
-			headers: { "Content-Type": "application/json" },
-			body: JSON.stringify({ button_id: buttonId }),
+function pad2(n) {
+	return String(n).padStart(2, "0");
+}
+
+function localDayIso(date) {
+	return `${date.getFullYear()}-${pad2(date.getMonth() + 1)}-${pad2(date.getDate())}`;
+}
+
+function newClickId() {
+	if (window.crypto && typeof window.crypto.randomUUID === "function") {
+		return window.crypto.randomUUID();
+	}
+	return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2, 12)}`;
+}
+
+// --- Persisted queue -----------------------------------------------------
+
+function openQueueDb() {
+	if (queueDbPromise) return queueDbPromise;
+	queueDbPromise = new Promise((resolve) => {
+		if (!window.indexedDB) {
+			resolve(null);
+			return;
+		}
+		const req = window.indexedDB.open(QUEUE_DB_NAME, 1);
+		req.onupgradeneeded = () => {
+			req.result.createObjectStore(QUEUE_STORE, { keyPath: "id" });
+		};
+		req.onsuccess = () => resolve(req.result);
+		// Private browsing / blocked storage: keep the queue in memory only.
+		req.onerror = () => resolve(null);
+	});
+	return queueDbPromise;
+}
+
+function runQueueTx(mode, fn) {
+	return openQueueDb().then(
+		(db) =>
+			new Promise((resolve, reject) => {
+				if (!db) {
+					resolve(fn(null));
+					return;
+				}
+				const tx = db.transaction(QUEUE_STORE, mode);
+				const result = fn(tx.objectStore(QUEUE_STORE));
+				tx.oncomplete = () => resolve(result);
+				tx.onerror = () => reject(tx.error);
+				// Quota exceeded and similar failures abort without an error event.
+				tx.onabort = () => reject(tx.error || new Error("Transação abortada."));
+			})
+	);
+}
+
+function queuePut(entry) {
+	return runQueueTx("readwrite", (store) => {
+		if (store) store.put(entry);
+		else memoryQueue.set(entry.id, entry);
+	});
+}
+
+function queueDelete(ids) {
+	return runQueueTx("readwrite", (store) => {
+		ids.forEach((id) => {
+			if (store) store.delete(id);
+			else memoryQueue.delete(id);
 		});
-		const data = await res.json().catch(() => ({}));
-		if (!res.ok) {
-			throw new Error(data && data.error ? data.error : "Erro ao registar.");
+	});
+}
+
+function queueReadAll() {
+	return openQueueDb().then(
+		(db) =>
+			new Promise((resolve, reject) => {
+				if (!db) {
+					resolve(Array.from(memoryQueue.values()));
+					return;
+				}
+				const req = db.transaction(QUEUE_STORE, "readonly").objectStore(QUEUE_STORE).getAll();
+				req.onsuccess = () => resolve(req.result || []);
+				req.onerror = () => reject(req.error);
+			})
+	).then((entries) =>
+		entries
+			// Taps queued before entries carried a station belong to whoever logs in next.
+			.filter((e) => e.station === undefined || e.station === currentStation)
+			.sort((a, b) => a.tapped_at - b.tapped_at)
+	);
+}
+
+// --- Provisional sequence numbers -----------------------------------------
+// The last `seq` handed out per (day, button). Provisional numbers continue
+// from it; server results replace it with the authoritative value.
+
+function loadSeqCounters() {
+	try {
+		return JSON.parse(window.localStorage.getItem(seqStorageKey) || "{}") || {};
+	} catch (_) {
+		return {};
+	}
+}
+
+function saveSeqCounters(counters) {
+	const today = localDayIso(new Date());
+	const kept = {};
+	Object.keys(counters).forEach((key) => {
+		if (key.startsWith(today)) kept[key] = counters[key];
+	});
+	try {
+		window.localStorage.setItem(seqStorageKey, JSON.stringify(kept));
+	} catch (_) {
+		// Storage full or disabled: provisional numbers just restart at the server value.
+	}
+}
+
+function seqKey(dayIso, buttonId) {
+	return `${dayIso}|${buttonId}`;
+}
+
+function nextProvisionalSeq(dayIso, buttonId) {
+	const counters = loadSeqCounters();
+	const key = seqKey(dayIso, buttonId);
+	const seq = (counters[key] || 0) + 1;
+	counters[key] = seq;
+	saveSeqCounters(counters);
+	return seq;
+}
+
+function seedSeqCounters(dayIso, buttons) {
+	if (dayIso !== localDayIso(new Date())) return;
+	const counters = loadSeqCounters();
+	buttons.forEach((btn) => {
+		const key = seqKey(dayIso, btn.button_id);
+		counters[key] = Math.max(counters[key] || 0, Number(btn.seq_today) || 0);
+	});
+	saveSeqCounters(counters);
+}
+
+async function reconcileSeqCounters() {
+	// Continue after the highest authoritative seq plus what is still queued.
+	const pending = await queueReadAll();
+	const counters = loadSeqCounters();
+	pending.forEach((entry) => {
+		const key = seqKey(entry.day_iso, entry.button_id);
+		counters[key] = Math.max(counters[key] || 0, entry.provisional_seq);
+	});
+	saveSeqCounters(counters);
+}
+
+// --- Flush ----------------------------------------------------------------
+
+function scheduleFlush(delay) {
+	if (flushTimer) clearTimeout(flushTimer);
+	flushTimer = setTimeout(() => {
+		flushTimer = null;
+		flushQueue();
+	}, delay);
+}
+
+async function postBatch(entries) {
+	const res = await fetch("/api/clicks/batch", {
+		method: "POST",
+		headers: { "Content-Type": "application/json", Accept: "application/json" },
+		body: JSON.stringify({
+			clicks: entries.map((e) => ({ id: e.id, button_id: e.button_id, tapped_at: e.tapped_at })),
+		}),
+	});
+	if (res.redirected) {
+		// Session expired: the queue survives in IndexedDB until the next login.
+		window.location.href = "/";
+		throw new Error("Sessão terminada.");
+	}
+	const data = await res.json().catch(() => null);
+	if (!res.ok || !data || !Array.isArray(data.results)) {
+		throw new Error(data && data.error ? data.error : "Erro ao registar.");
+	}
+	return data;
+}
+
+function applyBatchResult(entries, data) {
+	const byId = new Map(entries.map((e) => [e.id, e]));
+	const authoritative = {};
+
+	data.results.forEach((result) => {
+		const entry = byId.get(result.id);
+		if (!entry) return;
+		const key = seqKey(entry.day_iso, entry.button_id);
+		authoritative[key] = Math.max(authoritative[key] || 0, result.seq);
+		if (result.seq !== entry.provisional_seq) {
+			showToast(`#${entry.provisional_seq} → #${result.seq} · ${result.button}`);
 		}
+	});
+
+	// The server value wins, even when it is lower than our provisional guess.
+	const counters = loadSeqCounters();
+	Object.assign(counters, authoritative);
+	saveSeqCounters(counters);
 
-		const label = data.button || buttonLabel || `Botão ${data.button_id}`;
-		showToast(`#${data.seq} · ${label} · ${data.date} ${data.time}`);
+	(data.rejected || []).forEach((item) => {
+		showToast(`Clique rejeitado: ${item.error || "inválido"}`);
+	});
+}
+
+async function flushQueue() {
+	if (flushing) {
+		scheduleFlush(FLUSH_DELAY_MS);
+		return;
+	}
+	flushing = true;
+	try {
+		// Page opened offline: learn the session's station before sending its taps.
+		if (currentStation === null) await loadButtons();
+		for (;;) {
+			const pending = await queueReadAll();
+			if (!pending.length) break;
+
+			const batch = pending.slice(0, FLUSH_BATCH_SIZE);
+			const data = await postBatch(batch);
+			applyBatchResult(batch, data);
+
+			const doneIds = data.results.map((r) => r.id).concat((data.rejected || []).map((r) => r.id));
+			await queueDelete(doneIds.filter((id) => typeof id === "string"));
+			await reconcileSeqCounters();
+			retryDelay = RETRY_MIN_MS;
+		}
+	} catch (_) {
+		scheduleFlush(retryDelay);
+		retryDelay = Math.min(retryDelay * 2, RETRY_MAX_MS);
 	} finally {
-		setButtonsDisabled(false);
+		flushing = false;
+	}
+}
+
+async function handleClick(buttonId, buttonLabel) {
+	const now = new Date();
+	const dayIso = localDayIso(now);
+	const entry = {
+		id: newClickId(),
+		station: currentStation,
+		button_id: buttonId,
+		tapped_at: now.getTime(),
+		day_iso: dayIso,
+		provisional_seq: nextProvisionalSeq(dayIso, buttonId),
+	};
+
+	try {
+		await queuePut(entry);
+	} catch (_) {
+		// Never confirm a tap that is not stored anywhere; give its number back.
+		const counters = loadSeqCounters();
+		const key = seqKey(dayIso, buttonId);
+		if (counters[key] === entry.provisional_seq) {
+			counters[key] = entry.provisional_seq - 1;
+			saveSeqCounters(counters);
+		}
+		showToast("Clique não registado: sem espaço no dispositivo.");
+		return;
 	}
+
+	const label = buttonLabel || `Botão ${buttonId}`;
+	const date = `${pad2(now.getDate())}/${pad2(now.getMonth() + 1)}/${now.getFullYear()}`;
+	showToast(`#${entry.provisional_seq} · ${label} · ${date} ${pad2(now.getHours())}:${pad2(now.getMinutes())}`);
+	scheduleFlush(FLUSH_DELAY_MS);
 }
 
 function renderButtons(buttons) {
@@ -98,13 +359,31 @@ function renderButtons(buttons) {
 	});
 }
 
+async function loadButtons() {
+	const data = await fetchJson("/api/buttons/config");
+	if (data.station) {
+		currentStation = data.station;
+		seqStorageKey = `${SEQ_STORAGE_KEY}.${data.station}`;
+	}
+	seedSeqCounters(data.date_iso, data.buttons || []);
+	await reconcileSeqCounters();
+	renderButtons(data.buttons || []);
+}
+
 async function wireUi() {
+	window.addEventListener("online", () => scheduleFlush(0));
+	document.addEventListener("visibilitychange", () => {
+		if (document.visibilityState === "visible") scheduleFlush(0);
+	});
+
 	try {
-		const data = await fetchJson("/api/buttons/config");
-		renderButtons(data.buttons || []);
+		await loadButtons();
 	} catch (err) {
 		alert(err.message || "Erro ao carregar botões.");
 	}
+
+	// Flush anything left over from a previous session (offline, reload, crash).
+	scheduleFlush(0);
 }
 
 wireUi();
@@ -8,6 +8,32 @@ async function postJson(url, body) {
   return { ok: res.ok, status: res.status, data };
 }
 
+const STATION_STORAGE_KEY = "clickcounter.station";
+
+// The station comes from `/?station=<nome>` (empty for the default one) or,
+// without it, from the last successful login on this device.
+function currentStation() {
+  const params = new URLSearchParams(window.location.search);
+  if (params.has("station")) {
+    return { station: (params.get("station") || "").trim(), remembered: false };
+  }
+  try {
+    return { station: window.localStorage.getItem(STATION_STORAGE_KEY) || "", remembered: true };
+  } catch (_) {
+    return { station: "", remembered: false };
+  }
+}
+
+// Only a station the server accepted is remembered, so a typo never sticks.
+function rememberStation(station) {
+  try {
+    if (station) window.localStorage.setItem(STATION_STORAGE_KEY, station);
+    else window.localStorage.removeItem(STATION_STORAGE_KEY);
+  } catch (_) {
+    // Storage disabled: the station has to be in the URL every time.
+  }
+}
+
 function setError(msg) {
   const el = document.getElementById("pinError");
   if (!el) return;
@@ -36,13 +62,18 @@ document.addEventListener("DOMContentLoaded", () => {
     setError("");
 
     const pin = input ? input.value : "";
-    const { ok, data } = await postJson("/api/auth/pin", { pin });
+    const { station, remembered } = currentStation();
+    const { ok, status, data } = await postJson("/api/auth/pin", station ? { pin, station } : { pin });
 
     if (!ok) {
+      // With a PIN typed, 400/503 mean the station itself is invalid or has no
+      // PIN: forget a remembered one so the next login goes to the default.
+      if (remembered && pin.trim() && (status === 400 || status === 503)) rememberStation("");
       setError(data && data.error ? data.error : "Falha ao autenticar.");
       return;
     }
 
+    rememberStation(data && data.station);
     window.location.href = "/admin";
   });
 
@@ -0,0 +1,1115 @@
+import csv
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from io import StringIO
+from urllib.parse import unquote, urlparse
+
+import queries as q
+
+try:
+    import psycopg2
+    import psycopg2.extensions
+    import psycopg2.pool
+except Exception:  # pragma: no cover - optional when running on SQLite only
+    psycopg2 = None
+
+
+EXPORT_COLUMNS = ["id", "button_id", "button", "seq", "date", "date_iso", "time", "timestamp"]
+# Compact canonical form of a stored click: the label comes from button_config
+# and `date`/`time` are rendered from date_iso/timestamp when exporting.
+IMPORT_COLUMNS = ["button_id", "seq", "date_iso", "timestamp"]
+# Per-row copies written by older versions; `flask maintenance` clears and drops them.
+LEGACY_CLICK_COLUMNS = ("button", "date", "time")
+# Tables covered by storage_report() and vacuum().
+TABLES = ("click", "click_daily", "button_config", "passwords")
+
+# Station that pre-multi-station data belongs to.
+DEFAULT_STATION = "default"
+
+
+class Storage(ABC):
+    """Click, button config and PIN persistence, scoped by station.
+
+    Every table carries a `station` column, so one deployment serves many
+    kiosks; each method takes the station it operates on.
+
+    Subclasses implement the abstract methods: `transaction()`, the schema,
+    bulk loading, maintenance and the way a query declared in queries.py is
+    executed. Other statements are written
+    once with `%s` placeholders for both backends.
+
+    Stats read from `click_daily`, a (station, day, button_id) -> clicks
+    rollup kept up to date in the same transaction as every click insert.
+    The same row's `last_seq` is the last `seq` handed out for that day, so
+    allocating a `seq` only locks that station's rollup row. The two differ
+    once imported history has gaps in its numbering. Clicks without a
+    usable date are counted under day '' and unknown buttons under 0.
+
+    Clicks are written in the compact form of IMPORT_COLUMNS. Rows of older
+    versions may still carry LEGACY_CLICK_COLUMNS until `compact_clicks()`
+    and `drop_legacy_columns()` have run, so reads never depend on them.
+    """
+
+    @abstractmethod
+    def transaction(self, write=False):
+        """Context manager yielding a cursor inside one transaction."""
+
+    @abstractmethod
+    def init_schema(self):
+        """Create the tables and migrate older schemas in place."""
+
+    def run(self, cur, query, params=()):
+        """Execute a declared hot-path query, timing it under its name."""
+        started = time.perf_counter()
+        try:
+            self._execute_query(cur, query, params)
+        finally:
+            q.timings.record(query.name, time.perf_counter() - started)
+
+    @abstractmethod
+    def _execute_query(self, cur, query, params):
+        """Execute a declared query with the backend's prepared-statement mechanism."""
+
+    def _timestamp_param(self, value):
+        return value
+
+    def _timestamp_value(self, value):
+        return value
+
+    @abstractmethod
+    def _columns(self, cur, table):
+        """Return the set of column names of `table`."""
+
+    def _day_sql(self, columns):
+        """SQL expression giving a click's ISO day, or NULL, given the click table's columns."""
+        return "NULLIF(date_iso, '')"
+
+    # --- PIN -------------------------------------------------------------
+
+    def pin_count(self, station):
+        with self.transaction() as cur:
+            cur.execute("SELECT COUNT(*) FROM passwords WHERE station = %s;", (station,))
+            return int(cur.fetchone()[0])
+
+    def add_pin(self, station, pin_hash):
+        with self.transaction(write=True) as cur:
+            cur.execute(
+                "INSERT INTO passwords (station, pin_hash) VALUES (%s, %s);",
+                (station, pin_hash),
+            )
+
+    def current_pin_hash(self, station):
+        with self.transaction() as cur:
+            cur.execute(
+                "SELECT pin_hash FROM passwords WHERE station = %s ORDER BY id DESC LIMIT 1;",
+                (station,),
+            )
+            row = cur.fetchone()
+            return row[0] if row else None
+
+    # --- Button config ---------------------------------------------------
+
+    def seed_button_config(self, station, button_ids):
+        with self.transaction(write=True) as cur:
+            for bid in sorted(button_ids):
+                cur.execute(
+                    """
+                    INSERT INTO button_config (station, button_id, label)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (station, button_id) DO NOTHING;
+                    """,
+                    (station, bid, f"Botão {bid}"),
+                )
+
+    def button_config_map(self, station):
+        with self.transaction() as cur:
+            self.run(cur, q.BUTTON_CONFIG, (station,))
+            rows = cur.fetchall()
+        config = {}
+        for (bid, label, icon_key, icon_mime, icon_updated_at) in rows:
+            config[int(bid)] = {
+                "label": label,
+                "icon_key": icon_key,
+                "icon_mime": icon_mime,
+                "icon_updated_at": self._timestamp_value(icon_updated_at),
+            }
+        return config
+
+    def button_label(self, station, button_id):
+        with self.transaction() as cur:
+            self.run(cur, q.BUTTON_LABEL, (station, button_id))
+            row = cur.fetchone()
+            return row[0] if row else f"Botão {button_id}"
+
+    def update_button_label(self, station, button_id, label):
+        with self.transaction(write=True) as cur:
+            cur.execute(
+                "UPDATE button_config SET label = %s WHERE station = %s AND button_id = %s;",
+                (label, station, button_id),
+            )
+
+    def button_icon(self, station, button_id):
+        """Return (icon_key, icon_mime) or None when the button has no icon."""
+        with self.transaction() as cur:
+            cur.execute(
+                "SELECT icon_key, icon_mime FROM button_config WHERE station = %s AND button_id = %s;",
+                (station, button_id),
+            )
+            row = cur.fetchone()
+        if not row or not row[0]:
+            return None
+        return row[0], row[1]
+
+    def set_button_icon(self, station, button_id, icon_key, icon_mime):
+        updated_at = self._timestamp_param(datetime.now(timezone.utc))
+        with self.transaction(write=True) as cur:
+            cur.execute(
+                """
+                UPDATE button_config
+                SET icon_key = %s, icon_mime = %s, icon_updated_at = %s
+                WHERE station = %s AND button_id = %s;
+                """,
+                (icon_key, icon_mime, updated_at, station, button_id),
+            )
+
+    def clear_button_icon(self, station, button_id):
+        with self.transaction(write=True) as cur:
+            cur.execute(
+                """
+                UPDATE button_config
+                SET icon_key = NULL, icon_mime = NULL, icon_updated_at = NULL
+                WHERE station = %s AND button_id = %s;
+                """,
+                (station, button_id),
+            )
+
+    # --- Clicks ----------------------------------------------------------
+
+    def record_click(self, station, click):
+        """Insert a click and return its daily per-button `seq`."""
+        return self.record_clicks(station, [click])[0]
+
+    def record_clicks(self, station, clicks):
+        """Insert clicks in order and return the `seq` assigned to each.
+
+        Each click is a dict with button_id, button, day, date, time,
+        timestamp and an optional client_key. Allocating a `seq` locks only
+        its (station, day, button) counter row, so two clicks never share a
+        `seq`. A click whose client_key is already stored for the station is
+        not inserted again; its original `seq` is returned, which makes
+        client retries idempotent.
+        """
+        seqs = []
+        with self.transaction(write=True) as cur:
+            if any(click.get("client_key") for click in clicks):
+                # The client_key check-then-insert must not interleave with a
+                # retry of the same batch; plain taps skip this lock.
+                self._lock_station(cur, station)
+            for click in clicks:
+                client_key = click.get("client_key")
+                if client_key:
+                    self.run(cur, q.CLICK_BY_CLIENT_KEY, (station, client_key))
+                    row = cur.fetchone()
+                    if row is not None:
+                        seqs.append(row[0])
+                        continue
+
+                day_iso = click["day"].isoformat()
+                self.run(cur, q.CLICK_NEXT_SEQ, (station, day_iso, click["button_id"]))
+                seq = int(cur.fetchone()[0])
+                self.run(
+                    cur,
+                    q.CLICK_INSERT,
+                    (station, click["button_id"], seq, day_iso, click["timestamp"], client_key),
+                )
+                seqs.append(seq)
+        return seqs
+
+    def _lock_station(self, cur, station):
+        pass
+
+    def bulk_import(self, station, chunks, reject=None):
+        """Insert pre-validated click rows and return how many were inserted.
+
+        `chunks` yields lists of tuples ordered like IMPORT_COLUMNS. Every
+        chunk is bulk-loaded inside one transaction, and `click_daily` is
+        updated once after the last chunk, so a failed import leaves no trace.
+        The imported clicks are added to the totals as they are; a day's
+        counter never ends below the highest imported `seq`, so live clicks
+        never reuse an imported number.
+
+        A row whose `seq` is already stored for its (day, button), by a live
+        click, an earlier import or an earlier row, is skipped and passed to
+        `reject(index, row)`, `index` being its position in its chunk.
+        """
+        daily = Counter()
+        unnumbered = Counter()
+        max_seq = {}
+        inserted = 0
+        date_iso_idx = IMPORT_COLUMNS.index("date_iso")
+        button_id_idx = IMPORT_COLUMNS.index("button_id")
+        seq_idx = IMPORT_COLUMNS.index("seq")
+        with self.transaction(write=True) as cur:
+            for rows in chunks:
+                rows = self._skip_taken_seqs(cur, station, rows, reject)
+                if not rows:
+                    continue
+                self._load_clicks(cur, [(station,) + tuple(row) for row in rows])
+                for row in rows:
+                    key = (row[date_iso_idx] or "", row[button_id_idx] or 0)
+                    daily[key] += 1
+                    if row[seq_idx] is None:
+                        unnumbered[key] += 1
+                    else:
+                        max_seq[key] = max(max_seq.get(key, 0), row[seq_idx])
+                inserted += len(rows)
+
+            self._lock_station(cur, station)
+            for (day_iso, button_id), clicks in daily.items():
+                self.run(
+                    cur,
+                    q.DAILY_BUMP,
+                    (station, day_iso, button_id, clicks, unnumbered[(day_iso, button_id)]),
+                )
+            for (day_iso, button_id), seq in max_seq.items():
+                self.run(cur, q.DAILY_RAISE, (seq, station, day_iso, button_id, seq))
+        return inserted
+
+    def _skip_taken_seqs(self, cur, station, rows, reject):
+        """Return `rows` without those whose (day, button, seq) is already stored."""
+        date_iso_idx = IMPORT_COLUMNS.index("date_iso")
+        button_id_idx = IMPORT_COLUMNS.index("button_id")
+        seq_idx = IMPORT_COLUMNS.index("seq")
+
+        wanted = {}
+        for row in rows:
+            if row[seq_idx] is not None:
+                wanted.setdefault((row[date_iso_idx], row[button_id_idx]), []).append(row[seq_idx])
+        taken = {}
+        for (day_iso, button_id), seqs in wanted.items():
+            self.run(cur, q.CLICK_SEQS, (station, day_iso, button_id, min(seqs), max(seqs)))
+            taken[(day_iso, button_id)] = {int(seq) for (seq,) in cur.fetchall()}
+
+        kept = []
+        for index, row in enumerate(rows):
+            if row[seq_idx] is not None:
+                seqs = taken[(row[date_iso_idx], row[button_id_idx])]
+                if row[seq_idx] in seqs:
+                    if reject is not None:
+                        reject(index, row)
+                    continue
+                seqs.add(row[seq_idx])
+            kept.append(row)
+        return kept
+
+    @abstractmethod
+    def _load_clicks(self, cur, rows):
+        """Bulk-insert tuples ordered like ["station"] + IMPORT_COLUMNS."""
+
+    def _backfill_daily(self, cur):
+        """Build `click_daily` from the raw clicks when it is still empty."""
+        cur.execute("SELECT 1 FROM click_daily LIMIT 1;")
+        if cur.fetchone() is not None:
+            return
+        day_sql = self._day_sql(self._columns(cur, "click"))
+        cur.execute(
+            f"""
+            INSERT INTO click_daily (station, day, button_id, clicks, last_seq)
+            SELECT station, day, button_id, COUNT(*),
+                   CASE WHEN MAX(seq) > COUNT(*) THEN MAX(seq) ELSE COUNT(*) END
+            FROM (
+                SELECT
+                    station,
+                    COALESCE({day_sql}, '') AS day,
+                    COALESCE(button_id, 0) AS button_id,
+                    seq
+                FROM click
+            ) AS normalized
+            GROUP BY station, day, button_id;
+            """
+        )
+
+    def _migrate_daily_last_seq(self, cur):
+        """Give older rollups their `last_seq`, which used to be `clicks` itself."""
+        if "last_seq" not in self._columns(cur, "click_daily"):
+            cur.execute("ALTER TABLE click_daily ADD COLUMN last_seq BIGINT NOT NULL DEFAULT 0;")
+        cur.execute("UPDATE click_daily SET last_seq = clicks WHERE last_seq < clicks;")
+
+    def last_seqs_for_day(self, station, day):
+        """Return {button_id: last `seq` handed out} for one day."""
+        with self.transaction() as cur:
+            self.run(cur, q.DAILY_LAST_SEQS, (station, day.isoformat()))
+            return {int(b): int(c) for (b, c) in cur.fetchall()}
+
+    def stats(self, station, today, lookback_start):
+        """Return the aggregates behind /api/admin/stats."""
+        today_iso = today.isoformat()
+        # Hours are read from the UTC timestamp shifted to the app's local time.
+        utc_offset = int(datetime.now().astimezone().utcoffset().total_seconds())
+        with self.transaction() as cur:
+            self.run(cur, q.STATS_TOTAL, (station,))
+            total = int(cur.fetchone()[0])
+
+            self.run(cur, q.STATS_DAY_TOTAL, (station, today_iso))
+            total_today = int(cur.fetchone()[0])
+
+            self.run(cur, q.STATS_PER_BUTTON, (station,))
+            per_button = {int(b): int(c) for (b, c) in cur.fetchall()}
+
+            self.run(cur, q.STATS_PER_DAY, (station, lookback_start.isoformat()))
+            per_day = [{"date": d, "count": int(c)} for (d, c) in cur.fetchall()]
+
+            self.run(cur, q.STATS_PER_HOUR, (utc_offset, station, today_iso))
+            per_hour = [{"hour": int(h), "count": int(c)} for (h, c) in cur.fetchall()]
+
+        return {
+            "total": total,
+            "today": total_today,
+            "per_button": per_button,
+            "per_day": per_day,
+            "per_hour": per_hour,
+        }
+
+    def export_rows(self, station):
+        """Return the station's clicks as tuples ordered like EXPORT_COLUMNS, newest first."""
+        with self.transaction() as cur:
+            return self._select_clicks(cur, "c.station = %s", (station,), "c.id DESC")
+
+    def _select_clicks(self, cur, where, params, order_by, limit=None):
+        """Run a SELECT over `click c` and return rows shaped like EXPORT_COLUMNS.
+
+        Label and time come from the legacy columns while they still exist and
+        hold a value, otherwise from button_config and the timestamp. The day
+        is normalized the same way compact_clicks() will store it.
+        """
+        columns = self._columns(cur, "click")
+        legacy = {
+            col: f"CAST(c.{col} AS TEXT)" if col in columns else "NULL"
+            for col in LEGACY_CLICK_COLUMNS
+        }
+        sql = f"""
+            SELECT c.id, c.button_id, COALESCE({legacy["button"]}, b.label, ''), c.seq,
+                   {legacy["date"]}, {self._day_sql(columns)}, {legacy["time"]}, c.timestamp
+            FROM click c
+            LEFT JOIN button_config b ON b.station = c.station AND b.button_id = c.button_id
+            WHERE {where}
+            ORDER BY {order_by}
+        """
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        cur.execute(sql + ";", params)
+        return [self._export_row(row) for row in cur.fetchall()]
+
+    def _export_row(self, row):
+        cid, button_id, button, seq, date_val, date_iso, time_val, ts = row
+        ts = self._timestamp_value(ts)
+        if ts is not None:
+            ts = ts.astimezone()
+        date_iso = date_iso or (ts.date().isoformat() if ts else "")
+        if date_iso:
+            date_val = f"{date_iso[8:10]}/{date_iso[5:7]}/{date_iso[:4]}"
+        if not time_val and ts is not None:
+            time_val = ts.strftime("%H:%M:%S")
+        ts_text = ts.isoformat(timespec="seconds") if ts else None
+        return (cid, button_id, button, seq, date_val, date_iso, time_val, ts_text)
+
+    # --- Maintenance -----------------------------------------------------
+
+    def compact_clicks(self, batch_size):
+        """Rewrite legacy rows into the canonical form and return how many changed.
+
+        date_iso and timestamp are filled from the legacy columns where they
+        are missing. A legacy copy is only cleared once its replacement is
+        set: `button` needs button_id, `date` needs date_iso and `time` needs
+        timestamp. Rows that cannot be converted keep their legacy values, so
+        drop_legacy_columns() refuses to run. Rows are walked by id,
+        `batch_size` ids per transaction, so live clicks are never held up.
+        """
+        with self.transaction() as cur:
+            columns = self._columns(cur, "click")
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM click;")
+            max_id = int(cur.fetchone()[0])
+        legacy = [col for col in LEGACY_CLICK_COLUMNS if col in columns]
+        if not legacy:
+            return 0
+
+        day_sql = self._day_sql(columns)
+        timestamp_sql = f"COALESCE(timestamp, {self._legacy_timestamp_sql(day_sql, columns)})"
+        # What each legacy column is replaced by; SET expressions see the old row.
+        replaced_by = {"button": "button_id", "date": day_sql, "time": timestamp_sql}
+        assignments = [f"date_iso = COALESCE({day_sql}, date_iso)", f"timestamp = {timestamp_sql}"] + [
+            f"{col} = CASE WHEN ({replaced_by[col]}) IS NOT NULL THEN NULL ELSE {col} END" for col in legacy
+        ]
+        # Only rows that change, so unconvertible rows are not counted on every run.
+        pending = [f"({col} IS NOT NULL AND ({replaced_by[col]}) IS NOT NULL)" for col in legacy] + [
+            f"(NULLIF(date_iso, '') IS NULL AND ({day_sql}) IS NOT NULL)",
+            f"(timestamp IS NULL AND ({timestamp_sql}) IS NOT NULL)",
+        ]
+
+        compacted = 0
+        for start in range(0, max_id, batch_size):
+            with self.transaction(write=True) as cur:
+                cur.execute(
+                    f"""
+                    UPDATE click
+                    SET {", ".join(assignments)}
+                    WHERE id > %s AND id <= %s
+                      AND ({" OR ".join(pending)});
+                    """,
+                    (start, start + batch_size),
+                )
+                compacted += cur.rowcount
+        return compacted
+
+    @abstractmethod
+    def _legacy_timestamp_sql(self, day_sql, columns):
+        """SQL expression building a timestamp from a legacy row's day and `time`."""
+
+    def purge_clicks(self, before_day, batch_size, archive=None):
+        """Delete clicks of days before `before_day` and return how many went.
+
+        Only clicks whose day is already in `click_daily` are removed, so the
+        stats and `seq` counters are unchanged. Each batch is passed to
+        `archive(rows)` (rows shaped like EXPORT_COLUMNS) before it is deleted.
+        """
+        cutoff = before_day.isoformat()
+        where = """
+            c.station = %s AND c.date_iso <> '' AND c.date_iso < %s
+            AND EXISTS (
+                SELECT 1 FROM click_daily d WHERE d.station = c.station AND d.day = c.date_iso
+            )
+        """
+        with self.transaction() as cur:
+            cur.execute("SELECT DISTINCT station FROM click_daily ORDER BY station;")
+            stations = [row[0] for row in cur.fetchall()]
+
+        deleted = 0
+        for station in stations:
+            while True:
+                with self.transaction(write=True) as cur:
+                    rows = self._select_clicks(cur, where, (station, cutoff), "c.id", limit=batch_size)
+                    if not rows:
+                        break
+                    if archive is not None:
+                        archive(rows)
+                    cur.execute(
+                        f"DELETE FROM click WHERE id IN (SELECT c.id FROM click c WHERE {where} AND c.id <= %s);",
+                        (station, cutoff, rows[-1][0]),
+                    )
+                    deleted += len(rows)
+        return deleted
+
+    def drop_legacy_columns(self):
+        """Drop the legacy per-row columns emptied by compact_clicks(); return their names."""
+        with self.transaction(write=True) as cur:
+            columns = self._columns(cur, "click")
+            dropped = [col for col in LEGACY_CLICK_COLUMNS if col in columns]
+            for col in dropped:
+                cur.execute(f"SELECT COUNT(*) FROM click WHERE {col} IS NOT NULL;")
+                remaining = int(cur.fetchone()[0])
+                if remaining:
+                    raise RuntimeError(
+                        f"A coluna click.{col} ainda tem {remaining} valores que a compactação "
+                        "não conseguiu converter; as colunas antigas não foram removidas."
+                    )
+            for col in dropped:
+                cur.execute(f"ALTER TABLE click DROP COLUMN {col};")
+        return dropped
+
+    @abstractmethod
+    def vacuum(self, full=False):
+        """Reclaim the space freed by compaction and retention."""
+
+    @abstractmethod
+    def storage_report(self):
+        """Return {database_bytes, free_bytes, tables: [...]} with the size of each table.
+
+        Each table entry has rows, dead_rows, table_bytes, index_bytes and
+        free_bytes; values a backend cannot measure are None.
+        """
+
+
+if psycopg2 is not None:
+
+    class _PooledConnection(psycopg2.extensions.connection):
+        """Connection that remembers which statements it has PREPAREd."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.prepared = set()
+
+
+class PostgresStorage(Storage):
+    """psycopg2 backend with a thread-safe pool of long-lived connections.
+
+    Connections are kept open (DB_POOL_SIZE, default 10), so the statements
+    declared in queries.py stay prepared across requests. When all of them
+    are in use, a request waits for one to be returned (up to
+    DB_POOL_TIMEOUT seconds, default 30) instead of failing.
+    """
+
+    def __init__(self, database_url):
+        if psycopg2 is None:
+            raise RuntimeError("psycopg2 não está instalado.")
+        self.database_url = database_url
+        self.pool_size = int(os.getenv("DB_POOL_SIZE", "10"))
+        self.pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        # ThreadedConnectionPool raises PoolError when exhausted; this makes
+        # callers queue for a free connection instead.
+        self._pool_slots = threading.BoundedSemaphore(self.pool_size)
+
+    def _connect_kwargs(self):
+        kwargs = {"connection_factory": _PooledConnection}
+        # Replit/Postgres providers often require TLS.
+        # If the URL already sets sslmode, keep it; otherwise default to require.
+        if "sslmode=" not in self.database_url:
+            kwargs["sslmode"] = os.getenv("PGSSLMODE", "require")
+        return kwargs
+
+    def _get_pool(self):
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = psycopg2.pool.ThreadedConnectionPool(
+                        1,
+                        self.pool_size,
+                        self.database_url,
+                        **self._connect_kwargs(),
+                    )
+        return self._pool
+
+    @contextmanager
+    def _connection(self):
+        pool = self._get_pool()
+        if not self._pool_slots.acquire(timeout=self.pool_timeout):
+            raise RuntimeError("Sem ligações livres à base de dados (DB_POOL_SIZE).")
+        try:
+            conn = pool.getconn()
+            try:
+                yield conn
+            except BaseException:
+                # A failed transaction may have rolled back a PREPARE, and the
+                # connection itself may be broken: do not hand it out again.
+                pool.putconn(conn, close=True)
+                raise
+            pool.putconn(conn)
+        finally:
+            self._pool_slots.release()
+
+    @contextmanager
+    def transaction(self, write=False):
+        with self._connection() as conn:
+            with conn:
+                with conn.cursor() as cur:
+                    yield cur
+
+    def _execute_query(self, cur, query, params):
+        conn = cur.connection
+        if query.name not in conn.prepared:
+            cur.execute(query.prepare_sql())
+            conn.prepared.add(query.name)
+        cur.execute(query.execute_sql(), params)
+
+    def _columns(self, cur, table):
+        cur.execute(
+            """
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = %s;
+            """,
+            (table,),
+        )
+        return {row[0] for row in cur.fetchall()}
+
+    def _day_sql(self, columns):
+        if "date" in columns:
+            return q.NORMALIZED_DATE_SQL
+        return super()._day_sql(columns)
+
+    def init_schema(self):
+        create_click_sql = f"""
+        CREATE TABLE IF NOT EXISTS click (
+          id SERIAL PRIMARY KEY,
+          station TEXT NOT NULL DEFAULT '{DEFAULT_STATION}',
+          button_id INTEGER,
+          seq INTEGER,
+          date_iso TEXT,
+          timestamp TIMESTAMPTZ
+        );
+        """
+
+        create_passwords_sql = f"""
+        CREATE TABLE IF NOT EXISTS passwords (
+          id SERIAL PRIMARY KEY,
+          station TEXT NOT NULL DEFAULT '{DEFAULT_STATION}',
+          pin_hash TEXT NOT NULL,
+          created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+        );
+        """
+
+        create_button_config_sql = f"""
+        CREATE TABLE IF NOT EXISTS button_config (
+          station TEXT NOT NULL DEFAULT '{DEFAULT_STATION}',
+          button_id INTEGER NOT NULL,
+          label TEXT NOT NULL,
+          icon_key TEXT,
+          icon_mime TEXT,
+          icon_updated_at TIMESTAMPTZ,
+          PRIMARY KEY (station, button_id)
+        );
+        """
+
+        create_click_daily_sql = f"""
+        CREATE TABLE IF NOT EXISTS click_daily (
+          station TEXT NOT NULL DEFAULT '{DEFAULT_STATION}',
+          day TEXT NOT NULL,
+          button_id INTEGER NOT NULL,
+          clicks BIGINT NOT NULL,
+          last_seq BIGINT NOT NULL DEFAULT 0,
+          PRIMARY KEY (station, day, button_id)
+        );
+        """
+
+        with self.transaction(write=True) as cur:
+            cur.execute(create_click_sql)
+            cur.execute(create_passwords_sql)
+            cur.execute(create_button_config_sql)
+            cur.execute(create_click_daily_sql)
+            self._migrate_click_schema(cur)
+            self._migrate_button_config(cur)
+            self._migrate_stations(cur)
+            self._migrate_daily_last_seq(cur)
+            # Keep live clicks out while the rollup is rebuilt.
+            cur.execute("LOCK TABLE click IN EXCLUSIVE MODE;")
+            self._backfill_daily(cur)
+
+    def _migrate_click_schema(self, cur):
+        """Best-effort migration to support older schemas.
+
+        If a previous version created table `click` without some columns (ex: missing
+        button_id), we add them. We intentionally avoid NOT NULL constraints here to
+        keep older rows valid. Legacy columns are only touched while they exist.
+        """
+
+        columns = self._columns(cur, "click")
+        cur.execute("ALTER TABLE click ADD COLUMN IF NOT EXISTS button_id INTEGER;")
+        cur.execute("ALTER TABLE click ADD COLUMN IF NOT EXISTS seq INTEGER;")
+        if "date" in columns:
+            cur.execute("ALTER TABLE click ALTER COLUMN date TYPE TEXT;")
+        cur.execute("ALTER TABLE click ADD COLUMN IF NOT EXISTS date_iso TEXT;")
+        cur.execute("ALTER TABLE click ADD COLUMN IF NOT EXISTS timestamp TIMESTAMPTZ;")
+        cur.execute("ALTER TABLE click ADD COLUMN IF NOT EXISTS client_key TEXT;")
+
+        if "button" not in columns:
+            return
+        # Backfill button_id from button text when possible (e.g. "Botão 1").
+        cur.execute(
+            """
+            UPDATE click
+            SET button_id = (regexp_match(button, '(\\d+)'))[1]::int
+            WHERE button_id IS NULL
+              AND button IS NOT NULL
+              AND regexp_match(button, '(\\d+)') IS NOT NULL;
+            """
+        )
+
+    def _migrate_button_config(self, cur):
+        cur.execute("ALTER TABLE button_config ADD COLUMN IF NOT EXISTS icon_key TEXT;")
+        cur.execute("ALTER TABLE button_config ADD COLUMN IF NOT EXISTS icon_mime TEXT;")
+        cur.execute("ALTER TABLE button_config ADD COLUMN IF NOT EXISTS icon_updated_at TIMESTAMPTZ;")
+
+    def _migrate_stations(self, cur):
+        """Move single-station tables to (station, ...) keys; old rows join DEFAULT_STATION."""
+        for table in ("click", "passwords", "button_config", "click_daily"):
+            cur.execute(
+                f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS station TEXT NOT NULL "
+                f"DEFAULT '{DEFAULT_STATION}';"
+            )
+        self._ensure_primary_key(cur, "button_config", ["station", "button_id"])
+        self._ensure_primary_key(cur, "click_daily", ["station", "day", "button_id"])
+
+        cur.execute("DROP INDEX IF EXISTS click_day_button_idx;")
+        cur.execute(
+            "CREATE INDEX IF NOT EXISTS click_station_day_button_idx "
+            "ON click (station, date_iso, button_id);"
+        )
+        # Idempotency keys are only unique within a station.
+        cur.execute("DROP INDEX IF EXISTS click_client_key_idx;")
+        cur.execute(
+            """
+            CREATE UNIQUE INDEX IF NOT EXISTS click_station_client_key_idx
+            ON click (station, client_key) WHERE client_key IS NOT NULL;
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS passwords_station_idx ON passwords (station, id);")
+
+    def _ensure_primary_key(self, cur, table, columns):
+        cur.execute(
+            """
+            SELECT tc.constraint_name, kcu.column_name
+            FROM information_schema.table_constraints tc
+            JOIN information_schema.key_column_usage kcu
+              ON kcu.constraint_name = tc.constraint_name
+             AND kcu.table_schema = tc.table_schema
+             AND kcu.table_name = tc.table_name
+            WHERE tc.table_schema = current_schema()
+              AND tc.table_name = %s
+              AND tc.constraint_type = 'PRIMARY KEY'
+            ORDER BY kcu.ordinal_position;
+            """,
+            (table,),
+        )
+        rows = cur.fetchall()
+        if [column for (_, column) in rows] == columns:
+            return
+        if rows:
+            cur.execute(f'ALTER TABLE {table} DROP CONSTRAINT "{rows[0][0]}";')
+        cur.execute(f"ALTER TABLE {table} ADD PRIMARY KEY ({', '.join(columns)});")
+
+    def _lock_station(self, cur, station):
+        # Serializes keyed batches and imports of the same station, which also
+        # keeps two of them touching several buttons from deadlocking; plain
+        # taps and other stations are unaffected.
+        self.run(cur, q.STATION_LOCK, (station,))
+
+    def _load_clicks(self, cur, rows):
+        buf = StringIO()
+        # Empty unquoted CSV fields are read back by COPY as NULL.
+        csv.writer(buf).writerows(rows)
+        buf.seek(0)
+        cur.copy_expert(
+            f"COPY click (station, {', '.join(IMPORT_COLUMNS)}) FROM STDIN WITH (FORMAT csv);",
+            buf,
+        )
+
+    def _legacy_timestamp_sql(self, day_sql, columns):
+        time_sql = "COALESCE(time, TIME '00:00')" if "time" in columns else "TIME '00:00'"
+        return f"CASE WHEN ({day_sql}) IS NOT NULL THEN ({day_sql})::date + {time_sql} END"
+
+    def vacuum(self, full=False):
+        # VACUUM cannot run inside a transaction block.
+        with self._connection() as conn:
+            conn.autocommit = True
+            with conn.cursor() as cur:
+                for table in TABLES:
+                    cur.execute(f"VACUUM ({'FULL, ' if full else ''}ANALYZE) {table};")
+            conn.autocommit = False
+
+    def storage_report(self):
+        with self.transaction() as cur:
+            cur.execute("SELECT pg_database_size(current_database());")
+            database_bytes = int(cur.fetchone()[0])
+            cur.execute(
+                """
+                SELECT c.relname, COALESCE(s.n_live_tup, 0), COALESCE(s.n_dead_tup, 0),
+                       pg_table_size(c.oid), pg_indexes_size(c.oid)
+                FROM pg_class c
+                LEFT JOIN pg_stat_user_tables s ON s.relid = c.oid
+                WHERE c.relkind = 'r'
+                  AND c.relnamespace = (SELECT oid FROM pg_namespace WHERE nspname = current_schema())
+                  AND c.relname = ANY(%s);
+                """,
+                (list(TABLES),),
+            )
+            found = {row[0]: row[1:] for row in cur.fetchall()}
+        tables = []
+        for table in TABLES:
+            if table not in found:
+                continue
+            rows, dead_rows, table_bytes, index_bytes = found[table]
+            tables.append(
+                {
+                    "table": table,
+                    "rows": int(rows),
+                    "dead_rows": int(dead_rows),
+                    "table_bytes": int(table_bytes),
+                    "index_bytes": int(index_bytes),
+                    "free_bytes": None,
+                }
+            )
+        return {"database_bytes": database_bytes, "free_bytes": None, "tables": tables}
+
+
+class _SqliteCursor:
+    """Cursor wrapper that accepts the `%s` placeholders used by Storage."""
+
+    def __init__(self, cur):
+        self.raw = cur
+
+    def execute(self, sql, params=()):
+        return self.raw.execute(sql.replace("%s", "?"), params)
+
+    def executemany(self, sql, seq_of_params):
+        return self.raw.executemany(sql.replace("%s", "?"), seq_of_params)
+
+    def fetchone(self):
+        return self.raw.fetchone()
+
+    def fetchall(self):
+        return self.raw.fetchall()
+
+    @property
+    def rowcount(self):
+        return self.raw.rowcount
+
+
+class SqliteStorage(Storage):
+    """Embedded single-file backend for kiosks and offline development.
+
+    Each thread keeps one connection open, so sqlite3's statement cache
+    reuses the prepared statements across requests. The database runs in
+    WAL mode: readers (stats, export) never block the click writer.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+
+    def connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, cached_statements=256)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def transaction(self, write=False):
+        conn = self.connect()
+        # BEGIN IMMEDIATE takes the write lock up front, which is what
+        # serializes `seq` allocation (SQLite has a single writer anyway).
+        conn.execute("BEGIN IMMEDIATE;" if write else "BEGIN;")
+        try:
+            yield _SqliteCursor(conn.cursor())
+        except BaseException:
+            conn.execute("ROLLBACK;")
+            raise
+        conn.execute("COMMIT;")
+
+    def _execute_query(self, cur, query, params):
+        cur.raw.execute(query.sqlite_sql, params)
+
+    def _timestamp_param(self, value):
+        return value.isoformat(timespec="seconds")
+
+    def _timestamp_value(self, value):
+        return datetime.fromisoformat(value) if value else None
+
+    def _columns(self, cur, table):
+        cur.execute(f"PRAGMA table_info({table});")
+        return {row[1] for row in cur.fetchall()}
+
+    def _day_sql(self, columns):
+        legacy_date = ""
+        if "date" in columns:
+            # ISO dates and the app's own dd/mm/YYYY format.
+            legacy_date = """
+                CASE
+                    WHEN date GLOB '[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*' THEN substr(date, 1, 10)
+                    WHEN date GLOB '[0-9][0-9]/[0-9][0-9]/[0-9][0-9][0-9][0-9]*'
+                        THEN substr(date, 7, 4) || '-' || substr(date, 4, 2) || '-' || substr(date, 1, 2)
+                END,
+            """
+        return f"COALESCE(NULLIF(date_iso, ''), {legacy_date} substr(timestamp, 1, 10))"
+
+    def init_schema(self):
+        create_button_config_sql = f"""
+        CREATE TABLE IF NOT EXISTS button_config (
+          station TEXT NOT NULL DEFAULT '{DEFAULT_STATION}',
+          button_id INTEGER NOT NULL,
+          label TEXT NOT NULL,
+          icon_key TEXT,
+          icon_mime TEXT,
+          icon_updated_at TEXT,
+          PRIMARY KEY (station, button_id)
+        );
+        """
+
+        create_click_daily_sql = f"""
+        CREATE TABLE IF NOT EXISTS click_daily (
+          station TEXT NOT NULL DEFAULT '{DEFAULT_STATION}',
+          day TEXT NOT NULL,
+          button_id INTEGER NOT NULL,
+          clicks INTEGER NOT NULL,
+          last_seq INTEGER NOT NULL DEFAULT 0,
+          PRIMARY KEY (station, day, button_id)
+        );
+        """
+
+        with self.transaction(write=True) as cur:
+            cur.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS click (
+                  id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  station TEXT NOT NULL DEFAULT '{DEFAULT_STATION}',
+                  button_id INTEGER,
+                  seq INTEGER,
+                  date_iso TEXT,
+                  timestamp TEXT,
+                  client_key TEXT
+                );
+                """
+            )
+            if not self._has_column(cur, "click", "client_key"):
+                cur.execute("ALTER TABLE click ADD COLUMN client_key TEXT;")
+            cur.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS passwords (
+                  id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  station TEXT NOT NULL DEFAULT '{DEFAULT_STATION}',
+                  pin_hash TEXT NOT NULL,
+                  created_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+                );
+                """
+            )
+            for table in ("click", "passwords"):
+                if not self._has_column(cur, table, "station"):
+                    cur.execute(
+                        f"ALTER TABLE {table} ADD COLUMN station TEXT NOT NULL "
+                        f"DEFAULT '{DEFAULT_STATION}';"
+                    )
+            # Their primary key gains `station`, which SQLite can only do by
+            # rebuilding the table.
+            self._create_with_station(cur, "button_config", create_button_config_sql)
+            self._create_with_station(cur, "click_daily", create_click_daily_sql)
+
+            cur.execute("DROP INDEX IF EXISTS click_day_button_idx;")
+            cur.execute(
+                "CREATE INDEX IF NOT EXISTS click_station_day_button_idx "
+                "ON click (station, date_iso, button_id);"
+            )
+            cur.execute("DROP INDEX IF EXISTS click_client_key_idx;")
+            cur.execute(
+                """
+                CREATE UNIQUE INDEX IF NOT EXISTS click_station_client_key_idx
+                ON click (station, client_key) WHERE client_key IS NOT NULL;
+                """
+            )
+            cur.execute("CREATE INDEX IF NOT EXISTS passwords_station_idx ON passwords (station, id);")
+            self._migrate_daily_last_seq(cur)
+            self._backfill_daily(cur)
+
+    def _has_column(self, cur, table, column):
+        return column in self._columns(cur, table)
+
+    def _create_with_station(self, cur, table, create_sql):
+        cur.execute(create_sql)
+        if self._has_column(cur, table, "station"):
+            return
+        cur.execute(f"PRAGMA table_info({table});")
+        columns = ", ".join(row[1] for row in cur.fetchall())
+        cur.execute(f"ALTER TABLE {table} RENAME TO {table}_old;")
+        cur.execute(create_sql)
+        cur.execute(
+            f"INSERT INTO {table} (station, {columns}) "
+            f"SELECT '{DEFAULT_STATION}', {columns} FROM {table}_old;"
+        )
+        cur.execute(f"DROP TABLE {table}_old;")
+
+    def _load_clicks(self, cur, rows):
+        columns = ["station"] + IMPORT_COLUMNS
+        placeholders = ", ".join(["%s"] * len(columns))
+        cur.executemany(
+            f"INSERT INTO click ({', '.join(columns)}) VALUES ({placeholders});",
+            rows,
+        )
+
+    def _legacy_timestamp_sql(self, day_sql, columns):
+        time_sql = "COALESCE(time, '00:00:00')" if "time" in columns else "'00:00:00'"
+        return f"CASE WHEN ({day_sql}) IS NOT NULL THEN ({day_sql}) || 'T' || {time_sql} END"
+
+    def vacuum(self, full=False):
+        # SQLite's VACUUM always rewrites the whole file; `full` changes nothing.
+        conn = self.connect()
+        conn.execute("VACUUM;")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+
+    def storage_report(self):
+        with self.transaction() as cur:
+            cur.execute("PRAGMA page_size;")
+            page_size = int(cur.fetchone()[0])
+            cur.execute("PRAGMA page_count;")
+            page_count = int(cur.fetchone()[0])
+            cur.execute("PRAGMA freelist_count;")
+            free_pages = int(cur.fetchone()[0])
+
+            cur.execute("SELECT name, tbl_name FROM sqlite_master WHERE type IN ('table', 'index');")
+            owner = {name: table for (name, table) in cur.fetchall()}
+            try:
+                # dbstat is an optional compile-time module.
+                cur.execute("SELECT name, SUM(pgsize), SUM(unused) FROM dbstat GROUP BY name;")
+                pages = cur.fetchall()
+            except sqlite3.OperationalError:
+                pages = None
+
+            tables = []
+            for table in TABLES:
+                if table not in owner:
+                    continue
+                cur.execute(f"SELECT COUNT(*) FROM {table};")
+                entry = {
+                    "table": table,
+                    "rows": int(cur.fetchone()[0]),
+                    "dead_rows": None,
+                    "table_bytes": None,
+                    "index_bytes": None,
+                    "free_bytes": None,
+                }
+                if pages is not None:
+                    entry.update(table_bytes=0, index_bytes=0, free_bytes=0)
+                    for (name, size, unused) in pages:
+                        if owner.get(name) != table:
+                            continue
+                        entry["table_bytes" if name == table else "index_bytes"] += int(size)
+                        entry["free_bytes"] += int(unused)
+                tables.append(entry)
+
+        return {
+            "database_bytes": page_size * page_count,
+            "free_bytes": page_size * free_pages,
+            "tables": tables,
+        }
+
+
+def _sqlite_path(database_url):
+    # sqlite:///relative/path.db  or  sqlite:////absolute/path.db
+    path = unquote(urlparse(database_url).path)
+    if path.startswith("/"):
+        path = path[1:]
+    if not path:
+        raise RuntimeError("DATABASE_URL sqlite sem caminho para o ficheiro.")
+    return path
+
+
+def open_storage(database_url):
+    """Build the backend matching the URL scheme (postgres://, postgresql://, sqlite://)."""
+    if not database_url:
+        raise RuntimeError("Missing DATABASE_URL environment variable")
+
+    scheme = urlparse(database_url).scheme.lower()
+    if scheme in ("postgres", "postgresql"):
+        return PostgresStorage(database_url)
+    if scheme == "sqlite":
+        return SqliteStorage(_sqlite_path(database_url))
+    raise RuntimeError(f"Unsupported DATABASE_URL scheme: {scheme or '(empty)'}")
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = open_storage(os.getenv("DATABASE_URL"))
+    return _storage
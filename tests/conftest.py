@@ -0,0 +1,87 @@
+"""Fixtures shared by the test suite.
+
+Every test that uses `db` (or `client`) runs once per backend: against a
+temporary SQLite file and against PostgreSQL when TEST_DATABASE_URL points at
+a disposable database (its click tables are dropped before each test).
+"""
+
+import os
+
+import pytest
+
+# Importing app runs init_db(); never let it touch a real database.
+os.environ.pop("DATABASE_URL", None)
+
+import app as app_module  # noqa: E402
+import storage  # noqa: E402
+
+PIN = "1234"
+STATION_PIN = "9999"
+
+
+def _reset_postgres(url):
+    import psycopg2
+
+    conn = psycopg2.connect(url)
+    try:
+        with conn, conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {', '.join(storage.TABLES)} CASCADE;")
+    finally:
+        conn.close()
+
+
+@pytest.fixture(params=["sqlite", "postgresql"])
+def database_url(request, tmp_path):
+    if request.param == "sqlite":
+        return f"sqlite:///{tmp_path}/clicks.db"
+    url = os.getenv("TEST_DATABASE_URL")
+    if not url:
+        pytest.skip("TEST_DATABASE_URL não definido")
+    _reset_postgres(url)
+    return url
+
+
+@pytest.fixture
+def open_db(database_url, monkeypatch):
+    """Return a function that installs the backend and runs init_db() (after any legacy setup)."""
+    monkeypatch.setenv("ADMIN_PIN", PIN)
+    opened = []
+
+    def _open():
+        db = storage.open_storage(database_url)
+        monkeypatch.setattr(storage, "_storage", db)
+        app_module.init_db()
+        opened.append(db)
+        return db
+
+    yield _open
+
+    for db in opened:
+        if isinstance(db, storage.PostgresStorage) and db._pool is not None:
+            db._pool.closeall()
+
+
+@pytest.fixture
+def db(open_db):
+    return open_db()
+
+
+def _login(station=None, pin=PIN):
+    client = app_module.app.test_client()
+    payload = {"pin": pin}
+    if station:
+        payload["station"] = station
+    response = client.post("/api/auth/pin", json=payload)
+    assert response.status_code == 200, response.get_json()
+    return client
+
+
+@pytest.fixture
+def login(db):
+    """Return a function giving a test client logged in to a station."""
+    return _login
+
+
+@pytest.fixture
+def client(login):
+    return login()
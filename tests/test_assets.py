@@ -0,0 +1,131 @@
+import gzip
+import os
+
+import pytest
+from werkzeug.http import parse_accept_header
+
+import app as app_module
+from assets import MANIFEST_NAME, brotli, build_assets, pick_encoding
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    static = tmp_path / "static"
+    static.mkdir()
+    (static / "app.js").write_text("console.log('v1');\n" * 50)
+    (static / "styles.css").write_text("body { margin: 0; }\n" * 50)
+    (static / "logo.png").write_bytes(b"\x89PNG")
+    return static
+
+
+@pytest.fixture
+def assets_dir(tmp_path, monkeypatch):
+    """Build the real static files into a temporary dist for the app."""
+    out = tmp_path / "dist"
+    monkeypatch.setattr(app_module, "ASSETS_DIR", str(out))
+    monkeypatch.setattr(app_module, "_asset_manifest", None)
+    return out
+
+
+def test_build_fingerprints_and_compresses(static_dir, tmp_path):
+    out = tmp_path / "out"
+    manifest = build_assets(str(static_dir), str(out))
+
+    assert set(manifest) == {"app.js", "styles.css"}
+    hashed = manifest["app.js"]
+    assert hashed.startswith("app.") and hashed.endswith(".js") and hashed != "app.js"
+    assert (out / hashed).read_bytes() == (static_dir / "app.js").read_bytes()
+    assert gzip.decompress((out / f"{hashed}.gz").read_bytes()) == (static_dir / "app.js").read_bytes()
+    assert (out / f"{hashed}.br").exists() == (brotli is not None)
+    assert (out / MANIFEST_NAME).exists()
+
+    # Same content, same names and byte-identical files.
+    gz_before = (out / f"{hashed}.gz").read_bytes()
+    assert build_assets(str(static_dir), str(out)) == manifest
+    assert (out / f"{hashed}.gz").read_bytes() == gz_before
+
+
+def test_build_prunes_stale_files(static_dir, tmp_path):
+    out = tmp_path / "out"
+    old = build_assets(str(static_dir), str(out))["app.js"]
+    (static_dir / "app.js").write_text("console.log('v2');\n")
+    (out / "leftover.123.tmp").write_text("")
+
+    new = build_assets(str(static_dir), str(out))["app.js"]
+    assert new != old
+    remaining = set(os.listdir(out))
+    assert not {name for name in remaining if name.startswith(old)}
+    assert {new, f"{new}.gz", MANIFEST_NAME, "leftover.123.tmp"} <= remaining
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        ("br, gzip", "br" if brotli is not None else "gzip"),
+        ("gzip, deflate", "gzip"),
+        ("br;q=0, gzip", "gzip"),
+        ("gzip;q=0", None),
+        ("identity", None),
+        ("", None),
+    ],
+)
+def test_pick_encoding(static_dir, tmp_path, header, expected):
+    out = tmp_path / "out"
+    path = os.path.join(out, build_assets(str(static_dir), str(out))["app.js"])
+
+    chosen, encoding = pick_encoding(path, parse_accept_header(header))
+    assert encoding == expected
+    assert chosen == path + {"br": ".br", "gzip": ".gz", None: ""}[expected]
+
+
+def test_asset_url_uses_manifest(assets_dir):
+    with app_module.app.test_request_context():
+        url = app_module.asset_url("app.js")
+        assert url.startswith("/assets/app.") and url != "/assets/app.js"
+        assert app_module.asset_url("missing.js") == "/static/missing.js"
+
+    page = app_module.app.test_client().get("/").data.decode()
+    assert app_module._asset_manifest["gate.js"] in page
+
+
+def test_asset_url_falls_back_when_build_fails(tmp_path, monkeypatch):
+    blocker = tmp_path / "file"
+    blocker.write_text("")
+    monkeypatch.setattr(app_module, "ASSETS_DIR", str(blocker / "dist"))
+    monkeypatch.setattr(app_module, "_asset_manifest", None)
+    with app_module.app.test_request_context():
+        assert app_module.asset_url("app.js") == "/static/app.js"
+
+
+@pytest.mark.parametrize(
+    "header, encoding",
+    [
+        ("br", "br" if brotli is not None else None),
+        ("gzip", "gzip"),
+        ("identity", None),
+        ("gzip;q=0, br;q=0", None),
+    ],
+)
+def test_serves_fingerprinted_asset(assets_dir, header, encoding):
+    client = app_module.app.test_client()
+    with app_module.app.test_request_context():
+        url = app_module.asset_url("app.js")
+
+    response = client.get(url, headers={"Accept-Encoding": header})
+    assert response.status_code == 200
+    assert response.headers.get("Content-Encoding") == encoding
+    assert response.mimetype in ("application/javascript", "text/javascript")
+    assert response.headers["Vary"] == "Accept-Encoding"
+    cache_control = response.headers["Cache-Control"]
+    assert "immutable" in cache_control and "public" in cache_control
+    assert "max-age=31536000" in cache_control
+    if encoding is None:
+        with open(os.path.join(app_module.app.static_folder, "app.js"), "rb") as fh:
+            assert response.data == fh.read()
+
+
+def test_unknown_asset_is_404(assets_dir):
+    client = app_module.app.test_client()
+    assert client.get("/assets/app.js").status_code == 404
+    assert client.get("/assets/app.0123456789ab.js").status_code == 404
+    assert client.get(f"/assets/{MANIFEST_NAME}").status_code == 404
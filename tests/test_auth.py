@@ -0,0 +1,27 @@
+import app as app_module
+from conftest import PIN
+
+
+def test_login_with_seeded_pin(db):
+    client = app_module.app.test_client()
+    response = client.post("/api/auth/pin", json={"pin": PIN})
+    assert response.status_code == 200
+    assert response.get_json() == {"ok": True, "station": "default"}
+    assert client.get("/api/buttons/config").status_code == 200
+
+
+def test_wrong_pin_is_rejected(db):
+    client = app_module.app.test_client()
+    assert client.post("/api/auth/pin", json={"pin": "0000"}).status_code == 401
+    assert client.post("/api/auth/pin", json={"pin": ""}).status_code == 400
+    assert client.post("/api/auth/pin", data="x").status_code == 400
+
+
+def test_api_requires_session(db):
+    client = app_module.app.test_client()
+    assert client.post("/api/click", json={"button_id": 1}).status_code == 302
+
+
+def test_logout_ends_session(client):
+    client.post("/api/auth/logout")
+    assert client.get("/api/admin/stats").status_code == 302
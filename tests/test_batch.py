@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta, timezone
+
+
+def test_batch_is_idempotent(client):
+    now_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+    batch = {
+        "clicks": [
+            {"id": "b", "button_id": 1, "tapped_at": now_ms - 1000},
+            {"id": "a", "button_id": 1, "tapped_at": now_ms - 2000},
+            {"id": "c", "button_id": 9},
+            "not-a-click",
+        ]
+    }
+    first = client.post("/api/clicks/batch", json=batch).get_json()
+    # Inserted in tap order, whatever the order of the batch.
+    assert [(r["id"], r["seq"]) for r in first["results"]] == [("a", 1), ("b", 2)]
+    assert {r["id"] for r in first["rejected"]} == {"c", None}
+
+    retry = client.post("/api/clicks/batch", json=batch).get_json()
+    assert [(r["id"], r["seq"]) for r in retry["results"]] == [("a", 1), ("b", 2)]
+    assert client.get("/api/admin/stats").get_json()["total"] == 2
+
+
+def test_batch_keeps_offline_tap_time(client):
+    yesterday = datetime.now(timezone.utc).astimezone() - timedelta(days=1)
+    batch = {"clicks": [{"id": "old", "button_id": 4, "tapped_at": int(yesterday.timestamp() * 1000)}]}
+    result = client.post("/api/clicks/batch", json=batch).get_json()["results"][0]
+    assert result["date_iso"] == yesterday.date().isoformat()
+    assert client.get("/api/admin/stats").get_json()["today"] == 0
+
+
+def test_batch_limit(client):
+    batch = {"clicks": [{"id": str(i), "button_id": 1} for i in range(201)]}
+    assert client.post("/api/clicks/batch", json=batch).status_code == 400
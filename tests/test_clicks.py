@@ -0,0 +1,45 @@
+from datetime import datetime, timezone
+
+
+def _today_iso():
+    return datetime.now(timezone.utc).astimezone().date().isoformat()
+
+
+def test_seq_is_daily_and_per_button(client):
+    seqs = [client.post("/api/click", json={"button_id": b}).get_json()["seq"] for b in (1, 1, 2, 1)]
+    assert seqs == [1, 2, 1, 3]
+
+    response = client.post("/api/click", json={"button_id": 1}).get_json()
+    assert response["button_id"] == 1
+    assert response["button"] == "Botão 1"
+    assert response["date_iso"] == _today_iso()
+
+
+def test_invalid_button_is_rejected(client):
+    assert client.post("/api/click", json={"button_id": 9}).status_code == 400
+    assert client.post("/api/click", json={"button_id": "x"}).status_code == 400
+
+
+def test_stats(client):
+    for b in (1, 1, 3):
+        client.post("/api/click", json={"button_id": b})
+
+    stats = client.get("/api/admin/stats").get_json()
+    assert stats["total"] == 3
+    assert stats["today"] == 3
+    assert stats["perButton"] == {"1": 2, "2": 0, "3": 1, "4": 0}
+    assert stats["perDay"] == [{"date": _today_iso(), "count": 3}]
+    assert sum(h["count"] for h in stats["perHourToday"]) == 3
+    assert stats["buttonLabels"]["1"] == "Botão 1"
+
+
+def test_button_config(client):
+    response = client.post("/api/buttons/config", json={"button_id": 2, "label": "  Entrada  "})
+    assert response.get_json() == {"ok": True, "button_id": 2, "label": "Entrada"}
+    assert client.post("/api/buttons/config", json={"button_id": 7, "label": "x"}).status_code == 400
+
+    client.post("/api/click", json={"button_id": 2})
+    config = client.get("/api/buttons/config").get_json()
+    assert [b["label"] for b in config["buttons"]] == ["Botão 1", "Entrada", "Botão 3", "Botão 4"]
+    assert config["buttons"][1]["seq_today"] == 1
+    assert client.post("/api/click", json={"button_id": 2}).get_json()["button"] == "Entrada"
@@ -0,0 +1,34 @@
+import csv
+import io
+
+from openpyxl import load_workbook
+
+from storage import EXPORT_COLUMNS
+
+
+def _export_csv(client):
+    response = client.get("/admin/export?format=csv")
+    assert response.status_code == 200
+    return list(csv.reader(io.StringIO(response.data.decode("utf-8-sig"))))
+
+
+def test_export_formats(client):
+    client.post("/api/click", json={"button_id": 1})
+    client.post("/api/click", json={"button_id": 2})
+
+    rows = _export_csv(client)
+    assert rows[0] == EXPORT_COLUMNS
+    # Newest first.
+    assert [(r[1], r[2], r[3]) for r in rows[1:]] == [("2", "Botão 2", "1"), ("1", "Botão 1", "1")]
+    day, month, year = rows[1][4].split("/")
+    assert rows[1][5] == f"{year}-{month}-{day}"
+    assert len(rows[1][6]) == 8 and rows[1][7].startswith(rows[1][5])
+
+    txt = client.get("/admin/export?format=txt").data.decode("utf-8").splitlines()
+    assert txt[0].split("\t") == EXPORT_COLUMNS and len(txt) == 3
+
+    workbook = load_workbook(io.BytesIO(client.get("/admin/export.xlsx").data))
+    sheet_rows = list(workbook.active.iter_rows(values_only=True))
+    assert list(sheet_rows[0]) == EXPORT_COLUMNS and len(sheet_rows) == 3
+
+    assert client.get("/admin/export?format=pdf").status_code == 400
@@ -0,0 +1,114 @@
+import io
+
+import app as app_module
+from importer import import_clicks
+
+
+def _import(client, data, name):
+    response = client.post(
+        "/api/admin/import",
+        data={"file": (io.BytesIO(data), name)},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def _counts(report):
+    return report["read"], report["imported"], report["rejected"]
+
+
+def _today(client):
+    return client.get("/api/buttons/config").get_json()["date_iso"]
+
+
+def _without_id(rows):
+    return sorted(row[1:] for row in rows)
+
+
+def test_import_own_export_into_another_station(db, client, tmp_path):
+    for b in (1, 1, 3):
+        client.post("/api/click", json={"button_id": b})
+    original = db.export_rows("default")
+    runner = app_module.app.test_cli_runner()
+
+    for fmt, station in (("csv", "loja2"), ("xlsx", "loja3")):
+        path = tmp_path / f"clicks.{fmt}"
+        export_url = "/admin/export.xlsx" if fmt == "xlsx" else "/admin/export?format=csv"
+        path.write_bytes(client.get(export_url).data)
+
+        result = runner.invoke(args=["import-clicks", str(path), "--station", station])
+        assert result.exit_code == 0, result.output
+        assert "3 importados, 0 rejeitados de 3 lidos" in result.output
+        assert _without_id(db.export_rows(station)) == _without_id(original)
+
+    # Same station: every seq is already taken, nothing is counted twice.
+    report = _import(client, client.get("/admin/export?format=csv").data, "clicks.csv")
+    assert _counts(report) == (3, 0, 3)
+    assert "já existe" in report["errors"][0]["error"]
+    assert client.get("/api/admin/stats").get_json()["total"] == 3
+
+
+def test_import_reports_bad_rows(client):
+    data = (
+        "button_id,seq,date,time,timestamp\n"
+        "1,5,01/02/2024,10:11:12,\n"
+        "9,1,,,\n"
+        "x,,,,\n"
+        "2,,,,2023-05-06 07:08:09+00\n"
+        "3,,,,\n"
+    ).encode()
+    report = _import(client, data, "old.csv")
+    assert _counts(report) == (5, 2, 3)
+    assert [e["line"] for e in report["errors"]] == [3, 4, 6]
+
+    rows = {r[5]: r for r in app_module.get_storage().export_rows("default")}
+    assert rows["2024-02-01"][4] == "01/02/2024" and rows["2024-02-01"][6] == "10:11:12"
+    assert "2023-05-06" in rows
+
+
+def test_gapped_history_counts_rows_not_seqs(client):
+    today = _today(client)
+    data = "button_id,seq,date_iso\n" + "".join(f"1,{seq},{today}\n" for seq in range(100, 111))
+    assert _counts(_import(client, data.encode(), "partial.csv")) == (11, 11, 0)
+
+    stats = client.get("/api/admin/stats").get_json()
+    assert (stats["total"], stats["today"], stats["perButton"]["1"]) == (11, 11, 11)
+    assert stats["perDay"] == [{"date": today, "count": 11}]
+    assert client.get("/api/buttons/config").get_json()["buttons"][0]["seq_today"] == 110
+    assert client.post("/api/click", json={"button_id": 1}).get_json()["seq"] == 111
+    assert client.get("/api/admin/stats").get_json()["total"] == 12
+
+
+def test_unnumbered_rows_advance_the_counter(client):
+    today = _today(client)
+    client.post("/api/click", json={"button_id": 2})
+    _import(client, f"button_id,date_iso\n2,{today}\n2,{today}\n".encode(), "no-seq.csv")
+    assert client.post("/api/click", json={"button_id": 2}).get_json()["seq"] == 4
+
+
+def test_import_rejects_seqs_already_stored(db, client):
+    today = _today(client)
+    for _ in range(3):
+        client.post("/api/click", json={"button_id": 1})
+
+    data = f"button_id,seq,date_iso\n1,2,{today}\n1,3,{today}\n1,4,{today}\n1,4,{today}\n2,2,{today}\n"
+    # One row per chunk: duplicates are caught across chunks too.
+    report = import_clicks(db, "default", io.BytesIO(data.encode()), "csv", {1, 2}, chunk_size=1)
+    assert _counts(report) == (5, 2, 3)
+    assert [e["line"] for e in report["errors"]] == [2, 3, 5]
+    assert report["errors"][0]["error"] == f"seq 2 já existe em {today} para o botão 1."
+
+    stats = client.get("/api/admin/stats").get_json()
+    assert (stats["total"], stats["perButton"]["1"], stats["perButton"]["2"]) == (5, 4, 1)
+    assert client.post("/api/click", json={"button_id": 1}).get_json()["seq"] == 5
+    assert sorted(r[3] for r in db.export_rows("default") if r[1] == 1) == [1, 2, 3, 4, 5]
+
+
+def test_import_rejects_unknown_format(client):
+    response = client.post(
+        "/api/admin/import",
+        data={"file": (io.BytesIO(b"x"), "clicks.json")},
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 400
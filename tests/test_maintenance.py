@@ -0,0 +1,144 @@
+import csv
+import sqlite3
+from datetime import date
+
+import pytest
+
+from maintenance import run_maintenance
+from storage import EXPORT_COLUMNS, PostgresStorage
+
+# Table `click` as created before stations and the compact row format.
+LEGACY_CLICK_SQL = """
+CREATE TABLE click (
+  id {id_type},
+  button_id INTEGER,
+  button TEXT,
+  seq INTEGER,
+  date TEXT,
+  date_iso TEXT,
+  time {time_type},
+  timestamp {timestamp_type}
+);
+"""
+
+LEGACY_ROWS = [
+    (1, "Botão 1", 1, "2020-01-05", None, "10:00:00"),
+    (1, "Botão 1", 2, "05/01/2020", "2020-01-05", "12:00:00"),
+    (2, "Botão 2", 1, "06/01/2020", None, "11:30:00"),
+]
+
+
+def _create_legacy_click(database_url, rows):
+    if database_url.startswith("sqlite"):
+        conn = sqlite3.connect(database_url[len("sqlite:///"):])
+        ddl = LEGACY_CLICK_SQL.format(
+            id_type="INTEGER PRIMARY KEY AUTOINCREMENT", time_type="TEXT", timestamp_type="TEXT"
+        )
+        placeholder = "?"
+    else:
+        import psycopg2
+
+        conn = psycopg2.connect(database_url)
+        ddl = LEGACY_CLICK_SQL.format(id_type="SERIAL PRIMARY KEY", time_type="TIME", timestamp_type="TIMESTAMPTZ")
+        placeholder = "%s"
+    try:
+        cur = conn.cursor()
+        cur.execute(ddl)
+        cur.executemany(
+            f"INSERT INTO click (button_id, button, seq, date, date_iso, time) "
+            f"VALUES ({', '.join([placeholder] * 6)});",
+            rows,
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def legacy_db(database_url, open_db):
+    _create_legacy_click(database_url, LEGACY_ROWS)
+    return open_db()
+
+
+def _click_columns(db):
+    with db.transaction() as cur:
+        return db._columns(cur, "click")
+
+
+def _export(db):
+    return {(row[1], row[3]): row for row in db.export_rows("default")}
+
+
+def test_legacy_rows_are_migrated(legacy_db, login):
+    stats = login().get("/api/admin/stats").get_json()
+    assert stats["total"] == 3
+    assert stats["perButton"]["1"] == 2
+
+    rows = _export(legacy_db)
+    assert rows[(1, 1)][4:7] == ("05/01/2020", "2020-01-05", "10:00:00")
+    assert rows[(2, 1)][4:7] == ("06/01/2020", "2020-01-06", "11:30:00")
+
+
+def test_compact_retention_and_drop_columns(legacy_db, login, tmp_path):
+    before = _export(legacy_db)
+    client = login()
+    client.post("/api/click", json={"button_id": 1})
+
+    report = run_maintenance(legacy_db, drop_columns=True)
+    assert report["compacted"] == 3
+    assert report["dropped_columns"] == ["button", "date", "time"]
+    assert "drop_error" not in report
+    assert not {"button", "date", "time"} & _click_columns(legacy_db)
+    # Label, date and time exported as before compaction; only the timestamp is new.
+    after = _export(legacy_db)
+    assert {k: after[k][:7] for k in before} == {k: row[:7] for k, row in before.items()}
+    assert run_maintenance(legacy_db)["compacted"] == 0
+
+    with pytest.raises(ValueError):
+        run_maintenance(legacy_db, retention_days=1)
+
+    archive = tmp_path / "archive.csv"
+    report = run_maintenance(legacy_db, retention_days=30, archive_path=str(archive))
+    assert report["deleted"] == 3
+    assert report["before_day"] < date.today().isoformat()
+    with open(archive, encoding="utf-8-sig", newline="") as fh:
+        archived = list(csv.reader(fh))
+    assert archived[0] == EXPORT_COLUMNS
+    assert sorted(r[5] for r in archived[1:]) == ["2020-01-05", "2020-01-05", "2020-01-06"]
+
+    # Only today's raw click is left; the daily totals keep the old days.
+    assert len(legacy_db.export_rows("default")) == 1
+    stats = client.get("/api/admin/stats").get_json()
+    assert stats["total"] == 4
+    assert client.post("/api/click", json={"button_id": 1}).get_json()["seq"] == 2
+
+
+def test_unconvertible_rows_keep_legacy_columns(database_url, open_db):
+    _create_legacy_click(database_url, LEGACY_ROWS + [(None, "Entrada", 1, "02/01/2024", None, "11:00:00")])
+    db = open_db()
+
+    report = run_maintenance(db, drop_columns=True)
+    assert report["compacted"] == 4
+    assert report["dropped_columns"] == []
+    assert "click.button ainda tem 1 valores" in report["drop_error"]
+    assert {"button", "date", "time"} <= _click_columns(db)
+
+    with db.transaction() as cur:
+        cur.execute("SELECT button, date_iso FROM click WHERE button_id IS NULL;")
+        assert cur.fetchall() == [("Entrada", "2024-01-02")]
+    # The row that cannot be converted is not counted again.
+    assert run_maintenance(db)["compacted"] == 0
+
+
+def test_maintenance_cli(legacy_db):
+    import app as app_module
+
+    runner = app_module.app.test_cli_runner()
+    result = runner.invoke(args=["maintenance", "--drop-columns"])
+    assert result.exit_code == 0, result.output
+    assert "3 linhas compactadas" in result.output
+    assert "colunas removidas: button, date, time" in result.output
+
+    assert runner.invoke(args=["maintenance", "--retention-days", "3"]).exit_code != 0
+    if isinstance(legacy_db, PostgresStorage):
+        assert runner.invoke(args=["maintenance", "--vacuum-full"]).exit_code == 0
@@ -0,0 +1,70 @@
+import app as app_module
+from conftest import PIN, STATION_PIN
+
+
+def _add_station(name, pin=STATION_PIN):
+    result = app_module.app.test_cli_runner().invoke(args=["set-station-pin", name, "--pin", pin])
+    assert result.exit_code == 0, result.output
+    return result
+
+
+def test_set_station_pin_cli(db, login):
+    assert "loja2" in _add_station("Loja2").output
+    login("loja2", STATION_PIN)
+
+    client = app_module.app.test_client()
+    assert client.post("/api/auth/pin", json={"pin": PIN, "station": "loja2"}).status_code == 401
+    assert client.post("/api/auth/pin", json={"pin": PIN, "station": "loja3"}).status_code == 503
+    assert client.post("/api/auth/pin", json={"pin": PIN, "station": "não válida"}).status_code == 400
+
+    bad = app_module.app.test_cli_runner().invoke(args=["set-station-pin", "x y", "--pin", "1"])
+    assert bad.exit_code != 0
+
+
+def test_stations_are_isolated(db, login):
+    _add_station("loja2")
+    main, other = login(), login("loja2", STATION_PIN)
+
+    main.post("/api/buttons/config", json={"button_id": 1, "label": "Entrada"})
+    assert [main.post("/api/click", json={"button_id": 1}).get_json()["seq"] for _ in range(3)] == [1, 2, 3]
+    assert [other.post("/api/click", json={"button_id": 1}).get_json()["seq"] for _ in range(2)] == [1, 2]
+
+    main_stats = main.get("/api/admin/stats").get_json()
+    other_stats = other.get("/api/admin/stats").get_json()
+    assert (main_stats["total"], other_stats["total"]) == (3, 2)
+    assert (main_stats["buttonLabels"]["1"], other_stats["buttonLabels"]["1"]) == ("Entrada", "Botão 1")
+
+    main_config = main.get("/api/buttons/config").get_json()
+    other_config = other.get("/api/buttons/config").get_json()
+    assert (main_config["station"], other_config["station"]) == ("default", "loja2")
+    assert (main_config["buttons"][0]["seq_today"], other_config["buttons"][0]["seq_today"]) == (3, 2)
+
+    export = other.get("/admin/export?format=csv")
+    assert "clicks_loja2_" in export.headers["Content-Disposition"]
+    assert len(export.data.decode("utf-8-sig").splitlines()) == 3
+    assert "clicks_" in main.get("/admin/export?format=csv").headers["Content-Disposition"]
+
+
+def test_client_keys_are_per_station(db, login):
+    _add_station("loja2")
+    main, other = login(), login("loja2", STATION_PIN)
+    batch = {"clicks": [{"id": "shared-key", "button_id": 2}]}
+
+    assert main.post("/api/clicks/batch", json=batch).get_json()["results"][0]["seq"] == 1
+    # A kiosk of another station reusing the key gets its own click, not the first one.
+    other_result = other.post("/api/clicks/batch", json=batch).get_json()["results"][0]
+    assert other_result["seq"] == 1
+    assert other.get("/api/admin/stats").get_json()["total"] == 1
+    # And the retry on the first station is still deduplicated.
+    main.post("/api/clicks/batch", json=batch)
+    assert main.get("/api/admin/stats").get_json()["total"] == 1
+
+
+def test_station_lock_only_for_keyed_clicks(db, client, monkeypatch):
+    locked = []
+    monkeypatch.setattr(db, "_lock_station", lambda cur, station: locked.append(station))
+
+    client.post("/api/click", json={"button_id": 1})
+    assert locked == []
+    client.post("/api/clicks/batch", json={"clicks": [{"id": "k1", "button_id": 1}]})
+    assert locked == ["default"]
@@ -0,0 +1,45 @@
+import pytest
+
+import storage
+
+
+def test_storage_is_abstract():
+    with pytest.raises(TypeError):
+        storage.Storage()
+
+
+@pytest.mark.parametrize(
+    "url, backend",
+    [
+        ("sqlite:///clicks.db", storage.SqliteStorage),
+        ("sqlite:////var/lib/clicks.db", storage.SqliteStorage),
+        ("postgres://u:p@localhost/db", storage.PostgresStorage),
+        ("postgresql://u:p@localhost/db", storage.PostgresStorage),
+    ],
+)
+def test_open_storage_picks_backend(url, backend):
+    assert isinstance(storage.open_storage(url), backend)
+
+
+def test_open_storage_rejects_bad_urls():
+    for url in (None, "mysql://localhost/db", "sqlite:///"):
+        with pytest.raises(RuntimeError):
+            storage.open_storage(url)
+
+
+def test_init_schema_is_idempotent(db, client):
+    client.post("/api/click", json={"button_id": 1})
+    db.init_schema()
+    assert client.post("/api/click", json={"button_id": 1}).get_json()["seq"] == 2
+    assert client.get("/api/admin/stats").get_json()["total"] == 2
+
+
+def test_rollup_without_last_seq_is_migrated(db, client):
+    for _ in range(3):
+        client.post("/api/click", json={"button_id": 1})
+    with db.transaction(write=True) as cur:
+        cur.execute("ALTER TABLE click_daily DROP COLUMN last_seq;")
+
+    db.init_schema()
+    assert client.post("/api/click", json={"button_id": 1}).get_json()["seq"] == 4
+    assert client.get("/api/admin/stats").get_json()["total"] == 4